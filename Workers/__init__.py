@@ -3,9 +3,9 @@ from .upscaler_worker import UpscalerWorker
 from .png2jpg_worker import PNG2JPGWorker
 from .flatten_worker import FlattenWorker
 from .new_flatten_worker import NewFlattenWorker
-from .img2pdf_worker import ImgSeq2PDFWorker
+from .img2pdf_worker import ImgSeq2PDFWorker, ImgSeq2PDFPlanWorker
 from .trim_worker import TrimmerWorker
 
 
 __all__ = ['ImageSeqWorker', 'UpscalerWorker', 'PNG2JPGWorker', 'FlattenWorker', 'NewFlattenWorker',
-           'ImgSeq2PDFWorker', 'TrimmerWorker']
+           'ImgSeq2PDFWorker', 'ImgSeq2PDFPlanWorker', 'TrimmerWorker']
@@ -14,13 +14,33 @@ class ImgSeq2PDFWorker(QThread):
     progress_updated = Signal(int)
     worker_finished = Signal(tuple)
 
-    def __init__(self, folder: str, send2trash: bool, recursive: bool):
+    def __init__(self, folder: str, send2trash: bool, recursive: bool, workers: int = 1,
+                 page_workers: int = 1, max_dpi: int = 0, max_dimension: int = 0,
+                 append: bool = False, max_pages: int = 0, max_bytes: int = 0, output_format: str = "pdf",
+                 archives: bool = False, plan: dict | None = None):
         super().__init__()
         self.folder = folder
         self.send2trash = send2trash
         self.recursive = recursive
+        self.workers = workers
+        self.page_workers = page_workers
+        self.options = ImgSeq2PDF.page_options(max_dpi=max_dpi, max_dimension=max_dimension)
+        self.append = append
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self.output_format = output_format
+        self.archives = archives
+        self.settings = ImgSeq2PDF.run_settings(output_format=output_format, options=self.options, append=append,
+                                                max_pages=max_pages, max_bytes=max_bytes)
+        self.plan = plan
         self._stop = False
 
+    def plan_matches(self) -> bool:
+        """预估得到的计划是否与本次的文件夹和设置相同"""
+        return bool(self.plan) and self.plan["target_folder"] == self.folder and \
+            self.plan["recursive"] == self.recursive and self.plan["archives"] == self.archives and \
+            self.plan["settings"] == self.settings
+
     def run(self):
         logger.info(
             f"开始图像序列转PDF任务，目标路径: {self.folder}, 递归: {self.recursive}, 清理原文件: {self.send2trash}")
@@ -32,20 +52,37 @@ class ImgSeq2PDFWorker(QThread):
 
         self._stop = False
 
-        results = ImgSeq2PDF.process_image_sequences(
-            target_folder=self.folder,
-            send_to_trash=self.send2trash,
-            recursive=self.recursive
-        )
+        if self.plan_matches():
+            # 使用预估时找到的序列，不再重新查找
+            logger.info("使用预估得到的计划")
+            results = ImgSeq2PDF.execute_plan(self.plan, send_to_trash=self.send2trash, workers=self.workers,
+                                              page_workers=self.page_workers)
+        else:
+            results = ImgSeq2PDF.process_image_sequences(
+                target_folder=self.folder,
+                send_to_trash=self.send2trash,
+                recursive=self.recursive,
+                workers=self.workers,
+                page_workers=self.page_workers,
+                options=self.options,
+                append=self.append,
+                max_pages=self.max_pages,
+                max_bytes=self.max_bytes,
+                output_format=self.output_format,
+                archives=self.archives
+            )
 
         try:
             for res in results:
                 if self._stop:
+                    # 关闭生成器，取消进程池中尚未开始的序列
+                    results.close()
                     logger.info(ErrorCode.UserInterrupt.format("图像序列转PDF"))
                     self.worker_finished.emit(("提示", ErrorCode.UserInterrupt.format("图像序列转PDF"),
                                                QMessageBox.Icon.Information))
                     return
                 elif res[0] != ErrorCode.Success:
+                    results.close()
                     logger.error(ErrorCode.Unknown.generic)
                     self.worker_finished.emit(("错误", res[0].generic, QMessageBox.Icon.Information))
                     return
@@ -62,4 +99,37 @@ class ImgSeq2PDFWorker(QThread):
             return
 
     def stop(self):
-        self._stop = True
\ No newline at end of file
+        self._stop = True
+
+
+class ImgSeq2PDFPlanWorker(ImgSeq2PDFWorker):
+    """预估转换的规模和耗时，参数与 ImgSeq2PDFWorker 相同，不会写入任何文件"""
+    plan_ready = Signal(dict)
+
+    def run(self):
+        logger.info(f"开始预估图像序列转PDF任务，目标路径: {self.folder}, 递归: {self.recursive}")
+
+        if not self.folder or not os.path.isdir(self.folder):
+            logger.error(ErrorCode.InvalidPath.format(self.folder))
+            self.worker_finished.emit(("错误", ErrorCode.InvalidPath.format(self.folder), QMessageBox.Icon.Critical))
+            return
+
+        self._stop = False
+
+        try:
+            err, plan = ImgSeq2PDF.plan_image_sequences(self.folder, self.recursive, self.archives, self.settings,
+                                                        workers=self.workers)
+        except Exception as e:
+            logger.error(ErrorCode.Unknown.format(str(e)))
+            self.worker_finished.emit(("错误", ErrorCode.Unknown.format(str(e)), QMessageBox.Icon.Critical))
+            return
+
+        if self._stop:
+            logger.info(ErrorCode.UserInterrupt.format("预估"))
+            self.worker_finished.emit(("提示", ErrorCode.UserInterrupt.format("预估"), QMessageBox.Icon.Information))
+        elif err != ErrorCode.Success:
+            self.worker_finished.emit(("错误", err.generic, QMessageBox.Icon.Critical))
+        else:
+            self.plan_ready.emit(plan)
+            self.progress_updated.emit(0)
+            self.worker_finished.emit(("预估结果", ImgSeq2PDF.format_plan(plan), QMessageBox.Icon.Information))
@@ -12,16 +12,28 @@ logger = log_manager.get_logger(__name__)
 
 
 class PNG2JPGWorker(QThread):
-    progress_updated = Signal(int)
+    count_updated = Signal(int, int)
     worker_finished = Signal(tuple)
 
     def __init__(self, image_dir: str, recursive: bool, quality: int, skip_transparency: bool,
-                 preserve_metadata: bool, delete_origin: bool, deduplicate: int):
+                 preserve_metadata: bool, delete_origin: bool, deduplicate: int, workers: int = 1,
+                 incremental: bool = False, target_size: int = 0,
+                 memory_budget: int = PNG2JPG.MEMORY_BUDGET, max_dimension: int = 0,
+                 resample: str = "lanczos", content_dedup: bool = False, encoder: str = "jpeg",
+                 delete_batch: int = 16, resume: bool = False, writers: int = PNG2JPG.WRITER_THREADS,
+                 journal: bool = False):
         """
         PNG转JPG初始化
 
         finished信号用于弹出提示框，第一项为标题，第二项为内容，第三项为图标
 
+        查找和转换同时进行，count_updated信号的两项分别为已转换和已找到的文件数量
+
+        删除原文件时，每个原文件在确认输出文件已写入后加入待删除列表，攒够 delete_batch 个后一起移入回收站，
+        额外占用的磁盘空间不超过这一批文件的大小，中途终止时已确认的原文件也会被删除
+
+        启用 journal 时会在 image_dir 下记录任务日志，终止后可以用 resume 从上次的位置继续
+
         :param image_dir: 要处理的目录
         :param recursive: 递归查找
         :param quality: 质量
@@ -29,70 +41,136 @@ class PNG2JPGWorker(QThread):
         :param preserve_metadata: 保留元数据
         :param delete_origin: 是否在转换后删除原文件
         :param deduplicate: 去重模式，0覆盖，1跳过，2增加序号
+        :param workers: 转换使用的进程数，1为单进程转换
+        :param incremental: 增量转换，跳过上次转换后没有变化的图像
+        :param target_size: 目标文件大小（字节），大于0时quality作为质量上限
+        :param memory_budget: 多进程转换时的内存预算（字节），0为不限制
+        :param max_dimension: 输出图像的最大边长（像素），0为不限制
+        :param resample: 缩小图像时的重采样方式
+        :param content_dedup: 按内容去重，内容相同的图像只转换一次
+        :param encoder: 输出编码器，见 PNG2JPG.ENCODERS
+        :param delete_batch: 删除原文件时每批的数量，0为转换结束后一次性删除
+        :param resume: 继续上次被终止的任务，跳过已处理的文件和文件夹
+        :param writers: 写入线程数，编码结果由这些线程写入磁盘，0为编码后直接写入
+        :param journal: 记录任务日志，resume 为 True 时总是会记录
         """
         super().__init__()
         self.image_dir = image_dir
-        self.image_list = []
-        self.get_result = (ErrorCode.Success, [])
         self.recursive = recursive
         self.quality = quality
         self.skip_trans = skip_transparency
         self.metadata = preserve_metadata
         self.delete_origin = delete_origin
         self.deduplicate = deduplicate
+        self.workers = workers
+        self.incremental = incremental
+        self.target_size = target_size
+        self.memory_budget = memory_budget
+        self.max_dimension = max_dimension
+        self.resample = resample
+        self.content_dedup = content_dedup
+        self.encoder = encoder
+        self.delete_batch = delete_batch
+        self.resume = resume
+        self.writers = writers
+        self.journal = journal
+        self.pending_delete = []
+        self.delete_failed = 0
         self._stop = False
 
-    def get_images(self):
-        self.get_result = PNG2JPG.get_image_list(
-            folder=self.image_dir,
-            recursive=self.recursive,
-            pass_trans=self.skip_trans
-        )
-
     def stop(self):
         self._stop = True
 
-    def run(self):
-        logger.info(f"在 {self.image_dir} 下查找图像")
-        self.get_images()
-        # 如果出现错误
-        if self.get_result[0] == ErrorCode.Success:
-            self.image_list = self.get_result[1]
-        else:
-            self.worker_finished.emit(("错误",self.get_result[0].generic,QMessageBox.Icon.Critical))
+    def retire_source(self, source: str, output: str):
+        """
+        确认输出文件已写入后，将原文件加入待删除列表，达到批次大小时移入回收站
+
+        :param source: 原文件路径
+        :param output: 输出文件路径
+        """
+        if not output or not os.path.isfile(output) or os.path.getsize(output) == 0:
+            logger.warning(f"未找到 {source} 的输出文件，保留原文件")
             return
-        # 检查是否找到图像
-        if not self.image_list:
-            logger.error(ErrorCode.NoImageFound.generic)
-            self.worker_finished.emit(("错误",ErrorCode.NoImageFound.generic,QMessageBox.Icon.Critical))
+        # 输出就是原文件本身，或不是当前编码器写入的文件时，都不能删除原文件
+        if os.path.normcase(os.path.abspath(output)) == os.path.normcase(os.path.abspath(source)) or \
+                not output.lower().endswith(f".{PNG2JPG.ENCODERS[self.encoder]['extension']}"):
+            logger.warning(f"{source} 的输出文件 {output} 不是转换结果，保留原文件")
+            return
+        self.pending_delete.append(source)
+        if 0 < self.delete_batch <= len(self.pending_delete):
+            self.flush_deletes()
+
+    def flush_deletes(self):
+        """将待删除列表中的原文件移入回收站"""
+        if not self.pending_delete:
             return
-        # 转换并记录状态
-        logger.info("正在转换")
-        self.image_list = [os.path.normpath(i) for i in self.image_list]
-        res = PNG2JPG.convert_batch(
-            images=self.image_list,
+        logger.info(f"正在将 {len(self.pending_delete)} 项原图像移入回收站")
+        try:
+            send2trash.send2trash(self.pending_delete)
+        except Exception as e:
+            # 批量调用失败时逐个重试，只跳过确实无法删除的文件
+            logger.warning(f"批量移入回收站失败：{str(e)}，逐个重试")
+            for source in self.pending_delete:
+                try:
+                    send2trash.send2trash(source)
+                except Exception as single_e:
+                    logger.error(ErrorCode.TrashFailed.format(f"{source}：{str(single_e)}"))
+                    self.delete_failed += 1
+        self.pending_delete = []
+
+    def run(self):
+        logger.info(f"在 {self.image_dir} 下查找并转换图像")
+        self.pending_delete = []
+        self.delete_failed = 0
+        saved_seconds = 0.0
+        res = PNG2JPG.convert_stream(
+            folder=os.path.normpath(self.image_dir) if self.image_dir else self.image_dir,
+            recursive=self.recursive,
+            pass_trans=self.skip_trans,
             quality=self.quality,
             preserve_metadata=self.metadata,
-            deduplicate=self.deduplicate
+            deduplicate=self.deduplicate,
+            workers=self.workers,
+            incremental=self.incremental,
+            target_size=self.target_size,
+            memory_budget=self.memory_budget,
+            max_dimension=self.max_dimension,
+            resample=self.resample,
+            content_dedup=self.content_dedup,
+            encoder=self.encoder,
+            journal=self.journal,
+            resume=self.resume,
+            writers=self.writers
         )
-        for item in res:
+        for err, progress in res:
             # 手动终止
             if self._stop:
+                # 关闭生成器，停止查找并取消进程池中尚未开始的任务
+                res.close()
+                self.flush_deletes()
                 logger.error(ErrorCode.UserInterrupt.format("转换"))
                 self.worker_finished.emit(("信息",ErrorCode.UserInterrupt.format("转换"),QMessageBox.Icon.Information))
                 return
             # 状态异常
-            elif item[0] != ErrorCode.Success and item[0] != ErrorCode.FileSkipped:
-                logger.error(item[0].generic)
-                self.worker_finished.emit(("错误", item[0].generic, QMessageBox.Icon.Critical))
+            elif err != ErrorCode.Success and err != ErrorCode.FileSkipped:
+                res.close()
+                self.flush_deletes()
+                logger.error(err.generic)
+                self.worker_finished.emit(("错误", err.generic, QMessageBox.Icon.Critical))
                 return
             # 状态正常
             else:
-                self.progress_updated.emit(item[1])
-        # 删除
-        if self.delete_origin:
-            logger.info("正在清理原图像")
-            send2trash.send2trash(self.image_list)
+                if self.delete_origin:
+                    self.retire_source(progress["source"], progress["output"])
+                saved_seconds = progress["saved_seconds"]
+                self.count_updated.emit(progress["converted"], progress["discovered"])
+        # 删除剩余的原文件
+        self.flush_deletes()
         # 完成
         logger.info("转换已完成")
-        self.worker_finished.emit(("信息","转换已完成",QMessageBox.Icon.Information))
+        message = f"转换已完成，内容去重节省了约 {saved_seconds:.1f} 秒" if saved_seconds else "转换已完成"
+        if self.delete_failed:
+            message += f"，{self.delete_failed} 项原图像无法移入回收站"
+            self.worker_finished.emit(("警告", message, QMessageBox.Icon.Warning))
+            return
+        self.worker_finished.emit(("信息",message,QMessageBox.Icon.Information))
@@ -3,6 +3,7 @@ import os
 import send2trash
 from PySide6.QtWidgets import QApplication, QWidget, QMessageBox
 
+from modules.conv import PNG2JPG, ImgSeq2PDF
 from modules.text_proc import JsonSorter, CalSimilarity, CropText
 from modules.utils import ui_utils
 from Workers import *
@@ -24,15 +25,26 @@ class MyWindow(QWidget, Ui_Form):
         self.upscaler_worker = None
         self.png2jpg_worker = None
         self.seq2pdf_worker = None
+        self.seq2pdf_plan = None
         self.trimmer_worker = None
 
         # PNG转JPG信号
-        self.PNG2JPGRun.clicked.connect(self.png2jpg_run)
+        self.PNG2JPGRun.clicked.connect(lambda: self.png2jpg_run())
+        self.PNG2JPGResume.clicked.connect(lambda: self.png2jpg_run(resume=True))
         self.PNG2JPGStop.clicked.connect(lambda: self.png2jpg_worker.stop())
         self.PNG2JPGFindDir.clicked.connect(lambda: ui_utils.select_folder(self, self.PNG2JPGDirTxt))
         self.PNG2JPGQualitySlider.valueChanged.connect(lambda v: self.PNG2JPGQualityNum.setText(str(v)))
+        for key, encoder in PNG2JPG.ENCODERS.items():
+            self.PNG2JPGEncoder.addItem(encoder["label"], key)
+        # 无损编码器无法按目标大小编码
+        self.PNG2JPGEncoder.currentIndexChanged.connect(lambda: self.PNG2JPGTargetSize.setEnabled(
+            not PNG2JPG.is_lossless(self.PNG2JPGEncoder.currentData())
+        ))
         # 图像序列转PDF信号
-        self.Seq2PDFRun.clicked.connect(self.img2pdf_run)
+        for key, label in ImgSeq2PDF.OUTPUT_FORMATS.items():
+            self.Seq2PDFFormat.addItem(label, key)
+        self.Seq2PDFRun.clicked.connect(lambda: self.img2pdf_run())
+        self.Seq2PDFPlan.clicked.connect(lambda: self.img2pdf_run(plan_only=True))
         self.Seq2PDFStop.clicked.connect(lambda: self.seq2pdf_worker.stop())
         self.Seq2PDFPathOpen.clicked.connect(lambda: ui_utils.select_folder(self, self.Seq2PDFPathInput))
         # 裁剪文本信号
@@ -58,8 +70,9 @@ class MyWindow(QWidget, Ui_Form):
 
 
     # 会开启新线程的函数
-    def png2jpg_run(self):
+    def png2jpg_run(self, resume: bool = False):
         self.PNG2JPGRun.setEnabled(False)
+        self.PNG2JPGResume.setEnabled(False)
         self.PNG2JPGStop.setEnabled(True)
         self.png2jpg_worker = PNG2JPGWorker(
             image_dir=self.PNG2JPGDirTxt.text(),
@@ -68,28 +81,58 @@ class MyWindow(QWidget, Ui_Form):
             skip_transparency=self.PNG2JPGSkipAlpha.isChecked(),
             preserve_metadata=self.PNG2JPGPreverveMeta.isChecked(),
             delete_origin=self.PNG2JPGDelOri.isChecked(),
-            deduplicate=self.PNG2JPGDedup.currentIndex()
+            deduplicate=self.PNG2JPGDedup.currentIndex(),
+            workers=os.cpu_count() or 1,
+            incremental=self.PNG2JPGIncremental.isChecked(),
+            target_size=self.PNG2JPGTargetSize.value() * 1024,
+            max_dimension=self.PNG2JPGMaxSize.value(),
+            content_dedup=self.PNG2JPGContentDedup.isChecked(),
+            encoder=self.PNG2JPGEncoder.currentData(),
+            journal=self.PNG2JPGJournal.isChecked(),
+            resume=resume
         )
-        self.png2jpg_worker.progress_updated.connect(lambda v: self.PNG2JPGProgress.setValue(int(v)))
+        self.png2jpg_worker.count_updated.connect(lambda done, total: self.PNG2JPGProgress.setRange(0, total))
+        self.png2jpg_worker.count_updated.connect(lambda done, total: self.PNG2JPGProgress.setValue(done))
         self.png2jpg_worker.worker_finished.connect(lambda: self.PNG2JPGRun.setEnabled(True))
+        self.png2jpg_worker.worker_finished.connect(lambda: self.PNG2JPGResume.setEnabled(True))
         self.png2jpg_worker.worker_finished.connect(lambda: self.PNG2JPGStop.setEnabled(False))
         self.png2jpg_worker.worker_finished.connect(lambda t: ui_utils.show_message_box(self, t[0], t[1], t[2]))
         self.png2jpg_worker.start()
 
-    def img2pdf_run(self):
+    def img2pdf_run(self, plan_only: bool = False):
         self.Seq2PDFRun.setEnabled(False)
+        self.Seq2PDFPlan.setEnabled(False)
         self.Seq2PDFStop.setEnabled(True)
-        self.seq2pdf_worker = ImgSeq2PDFWorker(
+        # 预估得到的计划只使用一次，文件夹或设置与计划不同时会重新查找
+        plan, self.seq2pdf_plan = self.seq2pdf_plan, None
+        worker_class = ImgSeq2PDFPlanWorker if plan_only else ImgSeq2PDFWorker
+        self.seq2pdf_worker = worker_class(
             folder=self.Seq2PDFPathInput.text(),
             recursive=self.Seq2PDFRecursive.isChecked(),
-            send2trash=self.Seq2PDFDel.isChecked()
+            send2trash=self.Seq2PDFDel.isChecked(),
+            workers=os.cpu_count() or 1,
+            page_workers=os.cpu_count() or 1,
+            max_dpi=self.Seq2PDFMaxDPI.value(),
+            max_dimension=self.Seq2PDFMaxSize.value(),
+            append=self.Seq2PDFAppend.isChecked(),
+            max_pages=self.Seq2PDFVolumePages.value(),
+            max_bytes=self.Seq2PDFVolumeSize.value() * 1024 ** 2,
+            output_format=self.Seq2PDFFormat.currentData(),
+            archives=self.Seq2PDFArchives.isChecked(),
+            plan=plan
         )
+        if plan_only:
+            self.seq2pdf_worker.plan_ready.connect(self.set_seq2pdf_plan)
         self.seq2pdf_worker.worker_finished.connect(lambda: self.Seq2PDFRun.setEnabled(True))
+        self.seq2pdf_worker.worker_finished.connect(lambda: self.Seq2PDFPlan.setEnabled(True))
         self.seq2pdf_worker.worker_finished.connect(lambda: self.Seq2PDFStop.setEnabled(False))
         self.seq2pdf_worker.worker_finished.connect(lambda t: ui_utils.show_message_box(self, t[0], t[1], t[2]))
         self.seq2pdf_worker.progress_updated.connect(lambda v: self.Seq2PDFProgress.setValue(v))
         self.seq2pdf_worker.start()
 
+    def set_seq2pdf_plan(self, plan: dict):
+        self.seq2pdf_plan = plan
+
     # 在当前线程运行的函数
     def crop_text_run(self):
         res = CropText.crop_text_file(
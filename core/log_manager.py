@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 import logging
+import multiprocessing
 import zipfile
 from datetime import datetime
 import threading
@@ -55,8 +56,9 @@ def get_logger(name="main"):
                 if not os.path.exists(LOG_DIR):
                     os.makedirs(LOG_DIR)
 
-                # 执行归档
-                _archive_existing_log()
+                # 执行归档，进程池中的子进程与主进程共用同一个日志文件，不能归档
+                if multiprocessing.parent_process() is None:
+                    _archive_existing_log()
 
                 # Root Logger
                 root_logger.setLevel(logging.INFO)
@@ -1,10 +1,21 @@
+import io
+import json
 import os
+import queue
 import re
-from collections import defaultdict
-from typing import List, Dict, TypedDict, Generator
+import shutil
+import threading
+import time
+import zipfile
+from collections import defaultdict, deque
+from contextlib import closing, nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from typing import List, Dict, TypedDict, Generator, Iterable
 
 import fitz
 import send2trash
+from PIL import Image
 
 from core import log_manager
 from core.error_codes import ErrorCode
@@ -14,26 +25,94 @@ from modules.utils import utils
 logger = log_manager.get_logger(__name__)
 
 
+# 可以作为序列的图像扩展名
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp'}
+# 可以作为虚拟文件夹读取的压缩包扩展名
+ARCHIVE_EXTENSIONS = {'.zip', '.cbz'}
+# 正则表达式，用于匹配文件名中的前缀、数字和后缀
+SEQUENCE_PATTERN = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
+# 可以直接嵌入PDF的格式，JPEG 的压缩数据会被原样复制，不需要解码和重新编码
+EMBED_FORMATS = {"JPEG", "PNG"}
+# MuPDF 无法打开的格式，由 Pillow 解码后在内存中重新编码再嵌入
+REENCODE_FORMATS = {"WEBP"}
+# 重新编码为 JPEG 时使用的质量，带透明通道或无损压缩的图像会编码为 PNG
+REENCODE_QUALITY = 90
+# 图像没有分辨率信息时使用的分辨率，与 MuPDF 的 convert_to_pdf 一致，页面尺寸因此与之前相同
+DEFAULT_DPI = 96
+# EXIF 中的方向、分辨率和分辨率单位
+EXIF_ORIENTATION = 0x0112
+EXIF_X_RESOLUTION = 0x011A
+EXIF_Y_RESOLUTION = 0x011B
+EXIF_RESOLUTION_UNIT = 0x0128
+# JPEG 的 EXIF 方向对应的变换，MuPDF 转换 JPEG 时会按方向旋转，其他格式的方向会被忽略
+ORIENTATION_TRANSPOSE = {2: Image.Transpose.FLIP_LEFT_RIGHT, 3: Image.Transpose.ROTATE_180,
+                         4: Image.Transpose.FLIP_TOP_BOTTOM, 5: Image.Transpose.TRANSPOSE,
+                         6: Image.Transpose.ROTATE_270, 7: Image.Transpose.TRANSVERSE,
+                         8: Image.Transpose.ROTATE_90}
+# 并行准备页面时，每个线程最多领先正在插入的页面的数量，限制已准备但尚未插入的页面占用的内存
+REORDER_DEPTH = 4
+# 无损压缩的源格式，缩小后编码为 PNG，其余格式编码为 JPEG
+LOSSLESS_FORMATS = {"PNG", "BMP", "TIFF", "GIF"}
+# 嵌入PDF的页面来源清单，记录每一页对应的源文件，追加模式据此只添加新的帧
+MANIFEST_NAME = "jabort_sources.json"
+MANIFEST_VERSION = 1
+# 可选的输出格式及其在界面上的名称，扩展名与键相同
+OUTPUT_FORMATS = {
+    "pdf": "PDF",
+    "cbz": "CBZ（原样打包，不转换图像）"
+}
+# 打包 CBZ 时每次复制的字节数
+COPY_CHUNK_SIZE = 1024 * 1024
+# 写入本工具生成的 CBZ 的 ZIP 注释，查找压缩包中的序列时跳过带有此注释的压缩包
+ARCHIVE_COMMENT = b"JABORT ImgSeq2PDF"
+# 转换计划的格式版本
+PLAN_VERSION = 1
+# 预估时读取图像头部使用的线程数，主要耗时在文件读取上，所以线程数可以比核心数多
+PROBE_THREADS = 16
+# 预估时实际转换的样本页数
+CALIBRATION_PAGES = 20
+# 清理时每次移至回收站的最大路径数
+TRASH_BATCH_SIZE = 256
+# 清理队列在没有新路径时等待的秒数，超过后立即清理已收集的路径
+TRASH_WAIT_SECONDS = 2.0
+
+
+class PreparedPage(TypedDict):
+    """
+    已准备好插入PDF的页面
+
+    mode 为 embed 时直接嵌入源文件，为 stream 时嵌入重新编码的数据，为 convert 时由 MuPDF 转换为单页PDF后插入。
+    源文件来自压缩包时，stream 中是其原始数据，否则 embed 和 convert 从 path 读取
+    """
+    path: str
+    mode: str
+    width: float
+    height: float
+    stream: bytes | None
+
+
 class SequenceInfo(TypedDict):
-    """表示图像序列信息的类型定义"""
+    """
+    表示图像序列信息的类型定义，同一文件夹中的序列共用同一个 all_files 列表
+
+    archive 不为空时序列位于该压缩包中，folder 和各文件的路径是以压缩包路径开头的虚拟路径
+    """
     folder: str
     sequence: List[str]
     all_files: List[str]
     has_subfolder: bool
+    archive: str
 
 
-def _process_folder(dirpath: str, dirnames: List[str], filenames: List[str]) -> List[SequenceInfo]:
+def _process_folder(dirpath: str, dirnames: List[str], filenames: List[str],
+                    archive: str = "") -> List[SequenceInfo]:
     """
     处理单个文件夹中的图像序列，识别并分组序列文件。
     """
     sequence_groups: Dict[tuple, List[tuple]] = defaultdict(list)
-    IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp'}
-
-    # 正则表达式，用于匹配文件名中的前缀、数字和后缀
-    pattern = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
 
     for filename in filenames:
-        match = pattern.match(filename)
+        match = SEQUENCE_PATTERN.match(filename)
         if match:
             prefix, number_str, extension = match.groups()
 
@@ -41,15 +120,12 @@ def _process_folder(dirpath: str, dirnames: List[str], filenames: List[str]) ->
             if extension.lower() not in IMAGE_EXTENSIONS:
                 continue
 
-            try:
-                number = int(number_str)
-                full_path = os.path.join(dirpath, filename)
-                # 将 (数字, 完整路径) 添加到对应的组
-                sequence_groups[(prefix, extension)].append((number, full_path))
-            except ValueError:
-                continue
+            # 将 (数字, 完整路径) 添加到对应的组
+            sequence_groups[(prefix, extension)].append((int(number_str), os.path.join(dirpath, filename)))
 
     sequences: List[SequenceInfo] = []
+    # 文件夹的全部内容只构建一次，由其中的所有序列共用
+    all_files_in_dir = None
 
     # 检查每个分组，如果文件数量大于1，则认为是一个序列
     for _, files in sequence_groups.items():
@@ -61,23 +137,90 @@ def _process_folder(dirpath: str, dirnames: List[str], filenames: List[str]) ->
             sequence_paths = [path for num, path in files]
 
             # 构建所需字典的 'all_files' 部分
-            all_files_in_dir = [os.path.join(dirpath, f) for f in filenames] + \
-                               [os.path.join(dirpath, d) for d in dirnames]
+            if all_files_in_dir is None:
+                all_files_in_dir = [os.path.join(dirpath, f) for f in filenames] + \
+                                   [os.path.join(dirpath, d) for d in dirnames]
 
             sequence_info: SequenceInfo = {
                 "folder": dirpath,
                 "sequence": sequence_paths,
                 "all_files": all_files_in_dir,
-                "has_subfolder": bool(dirnames)
+                "has_subfolder": bool(dirnames),
+                "archive": archive
             }
             sequences.append(sequence_info)
 
     return sequences
 
 
-def find_image_sequences(root_folder: str, recursive: bool = False) -> tuple[ErrorCode, List[SequenceInfo]]:
+def _list_folder(dirpath: str) -> tuple[List[str], List[str], List[str]]:
+    """
+    使用一次 os.scandir 读取文件夹内容，类型信息来自 DirEntry 的缓存，通常不需要额外的 stat 调用。
+
+    :return: 元组，依次为子文件夹名、文件名和需要递归进入的子文件夹路径（不包含符号链接）
+    """
+    dirnames, filenames, walk_dirs = [], [], []
+    with os.scandir(dirpath) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    dirnames.append(entry.name)
+                    if not entry.is_symlink():
+                        walk_dirs.append(entry.path)
+                else:
+                    filenames.append(entry.name)
+            except OSError:
+                filenames.append(entry.name)
+    return dirnames, filenames, walk_dirs
+
+
+def _member_name(archive: str, path: str) -> str:
+    """压缩包中的虚拟路径对应的成员名"""
+    return os.path.relpath(path, archive).replace(os.sep, "/")
+
+
+def _scan_archive(archive_path: str) -> List[SequenceInfo]:
+    """
+    将 ZIP/CBZ 压缩包当作文件夹查找其中的图像序列，只读取压缩包的目录，不解压任何文件。
+
+    压缩包中的每个文件夹按 _process_folder 的规则分组，得到的路径以压缩包路径开头。
+    本工具生成的 CBZ 以 ARCHIVE_COMMENT 标记，不会被当作输入，避免再次运行时重复打包并清理上次的输出。
+    :param archive_path: 压缩包路径
+    :return: 找到的序列列表
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        if archive.comment == ARCHIVE_COMMENT:
+            logger.debug(f"跳过本工具生成的压缩包: {archive_path}")
+            return []
+        names = archive.namelist()
+    # 压缩包内文件夹 -> (子文件夹名, 文件名)
+    folders: Dict[str, tuple[set, list]] = defaultdict(lambda: (set(), []))
+    for name in names:
+        parent, _, filename = name.rstrip("/").rpartition("/")
+        if name.endswith("/"):
+            folders[name.rstrip("/")]
+        else:
+            folders[parent][1].append(filename)
+        # 登记每一级上级文件夹的子文件夹
+        while parent or filename:
+            grandparent, _, dirname = parent.rpartition("/")
+            if parent:
+                folders[grandparent][0].add(dirname)
+            parent, filename = grandparent, ""
+    sequences = []
+    for folder, (dirnames, filenames) in folders.items():
+        dirpath = os.path.join(archive_path, *folder.split("/")) if folder else archive_path
+        sequences.extend(_process_folder(dirpath, sorted(dirnames), filenames, archive_path))
+    return sequences
+
+
+def find_image_sequences(root_folder: str, recursive: bool = False,
+                         archives: bool = False) -> tuple[ErrorCode, List[SequenceInfo]]:
     """
     查找指定文件夹及其子文件夹（可选）中的所有图像序列。
+
+    每个文件夹只读取一次，遍历顺序与 os.walk 相同，无法读取的子文件夹会被跳过。
+    archives 为 True 时，ZIP/CBZ 压缩包被当作文件夹查找，无法读取的压缩包会被跳过。
     :return: 元组，第一项是错误码，第二项是找到的序列列表
     """
     logger.debug(f"正在扫描图像序列: {root_folder}, 递归: {recursive}")
@@ -89,14 +232,28 @@ def find_image_sequences(root_folder: str, recursive: bool = False) -> tuple[Err
     all_sequences_info: List[SequenceInfo] = []
 
     try:
-        if recursive:
-            for dirpath, dirnames, filenames in os.walk(root_folder):
-                all_sequences_info.extend(_process_folder(dirpath, dirnames, filenames))
-        else:
-            dirpath = root_folder
-            dirnames = [d for d in os.listdir(dirpath) if os.path.isdir(os.path.join(dirpath, d))]
-            filenames = [f for f in os.listdir(dirpath) if os.path.isfile(os.path.join(dirpath, f))]
+        pending_dirs = [root_folder]
+        while pending_dirs:
+            dirpath = pending_dirs.pop()
+            try:
+                dirnames, filenames, walk_dirs = _list_folder(dirpath)
+            except OSError as e:
+                if dirpath == root_folder:
+                    raise
+                logger.warning(f"无法读取文件夹 {dirpath}: {str(e)}")
+                continue
             all_sequences_info.extend(_process_folder(dirpath, dirnames, filenames))
+            for filename in filenames if archives else ():
+                if os.path.splitext(filename)[1].lower() not in ARCHIVE_EXTENSIONS:
+                    continue
+                archive_path = os.path.join(dirpath, filename)
+                try:
+                    all_sequences_info.extend(_scan_archive(archive_path))
+                except (OSError, zipfile.BadZipFile) as e:
+                    logger.warning(f"无法读取压缩包 {archive_path}: {str(e)}")
+            if recursive:
+                # 倒序入栈，使子文件夹按读取顺序处理
+                pending_dirs.extend(reversed(walk_dirs))
     except Exception as e:
         logger.error(f"扫描过程中发生异常: {str(e)}")
         return ErrorCode.Unknown, []
@@ -105,138 +262,1099 @@ def find_image_sequences(root_folder: str, recursive: bool = False) -> tuple[Err
     return ErrorCode.Success, all_sequences_info
 
 
-def create_pdf_from_sequence(sequence_info: SequenceInfo) -> tuple[ErrorCode, list[str]]:
+def _orientation(image: Image.Image) -> int:
+    """JPEG 的 EXIF 方向，其他格式总是为 1"""
+    if image.format != "JPEG":
+        return 1
+    orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+    return orientation if orientation in ORIENTATION_TRANSPOSE else 1
+
+
+def _jpeg_resolution(image: Image.Image) -> tuple[float, float]:
+    """
+    按 MuPDF 的规则读取 JPEG 的分辨率：EXIF 中有分辨率时只接受英寸和厘米单位，
+    否则使用单位为英寸或厘米的 JFIF 密度，都没有时为 DEFAULT_DPI。
+    Pillow 在只有 EXIF 块时报告的 72 DPI 不会被使用
+    """
+    exif = image.getexif()
+    if EXIF_X_RESOLUTION in exif and EXIF_Y_RESOLUTION in exif:
+        unit = exif.get(EXIF_RESOLUTION_UNIT)
+        if unit not in (2, 3):
+            return DEFAULT_DPI, DEFAULT_DPI
+        factor = 2.54 if unit == 3 else 1
+        return float(exif[EXIF_X_RESOLUTION]) * factor, float(exif[EXIF_Y_RESOLUTION]) * factor
+    unit = image.info.get("jfif_unit")
+    if unit in (1, 2):
+        factor = 2.54 if unit == 2 else 1
+        return tuple(value * factor for value in image.info["jfif_density"])
+    return DEFAULT_DPI, DEFAULT_DPI
+
+
+def _page_size(image: Image.Image) -> tuple[float, float]:
+    """
+    按图像的分辨率计算页面尺寸（点），只读取图像头部，不解码像素。JPEG 的 EXIF 方向会交换宽和高，与 MuPDF 一致
+
+    :param image: 已打开的图像
+    :return: 页面的宽和高
+    """
+    if image.format == "JPEG":
+        dpi = _jpeg_resolution(image)
+    else:
+        dpi = image.info.get("dpi")
+    x_res, y_res = (round(dpi[0]), round(dpi[1])) if dpi and min(dpi) >= 1 else (DEFAULT_DPI, DEFAULT_DPI)
+    width, height = image.width * 72 / x_res, image.height * 72 / y_res
+    return (height, width) if _orientation(image) >= 5 else (width, height)
+
+
+def _is_lossless_webp(img_path: str, data: bytes | None = None) -> bool:
+    """简单 WebP 文件的第一个数据块为 VP8L 时是无损压缩，data 不为 None 时从中读取文件头"""
+    if data is None:
+        with open(img_path, "rb") as f:
+            header = f.read(16)
+    else:
+        header = data[:16]
+    return header[:4] == b"RIFF" and header[8:16] == b"WEBPVP8L"
+
+
+def _encode_page(image: Image.Image, lossless: bool = False, quality: int = REENCODE_QUALITY) -> bytes:
+    """
+    将 MuPDF 无法直接打开或被缩小的图像编码为可以嵌入的格式，结果只保存在内存中。
+
+    :param image: 已打开的图像
+    :param lossless: 源图像是否为无损压缩
+    :param quality: 编码为 JPEG 时的质量
+    :return: 无损或带透明通道时为 PNG 数据，否则为 JPEG 数据
+    """
+    buffer = io.BytesIO()
+    if lossless:
+        image.convert("RGBA" if 'A' in image.mode else "RGB").save(buffer, "PNG")
+    elif 'A' in image.mode or "transparency" in image.info:
+        image.convert("RGBA").save(buffer, "PNG")
+    else:
+        if image.mode not in ("RGB", "L", "CMYK"):
+            image = image.convert("RGB")
+        image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def page_options(max_dpi: int = 0, max_dimension: int = 0, page_width: float = 0,
+                 quality: int = REENCODE_QUALITY, resample: str = "lanczos") -> dict:
+    """
+    汇总页面的尺寸和分辨率设置，默认值为按原样嵌入
+
+    :param max_dpi: 页面的最大分辨率，大于0时缩小分辨率超过此值的图像，页面尺寸不变
+    :param max_dimension: 图像的最大边长（像素），0 为不限制
+    :param page_width: 页面宽度（点），大于0时所有页面按比例缩放到此宽度，0 为按图像的分辨率计算
+    :param quality: 缩小后的图像编码为 JPEG 时的质量
+    :param resample: 缩小图像时的重采样方式，见 PNG2JPG.RESAMPLE_FILTERS
+    :return: 设置字典
+    """
+    return {"max_dpi": max_dpi, "max_dimension": max_dimension, "page_width": page_width,
+            "quality": quality, "resample": resample}
+
+
+def _target_pixels(image: Image.Image, width: float, options: dict) -> tuple[int, int] | None:
+    """
+    按最大分辨率和最大边长计算图像应缩小到的像素尺寸
+
+    :param image: 已打开的图像
+    :param width: 页面宽度（点）
+    :param options: page_options 返回的设置
+    :return: 缩小后的宽和高（旋转前），不需要缩小时为 None
+    """
+    scale = 1.0
+    if options["max_dpi"] > 0:
+        # 按方向旋转后，页面宽度对应图像的高
+        pixels = image.height if _orientation(image) >= 5 else image.width
+        scale = min(scale, options["max_dpi"] / (pixels * 72 / width))
+    if options["max_dimension"] > 0:
+        scale = min(scale, options["max_dimension"] / max(image.size))
+    target = max(1, round(image.width * scale)), max(1, round(image.height * scale))
+    return target if target != image.size else None
+
+
+def _prepare_page(img_path: str, options: dict | None = None,
+                  archive: zipfile.ZipFile | None = None) -> PreparedPage:
+    """
+    准备单个页面：读取尺寸，并在需要时解码和重新编码图像。不使用 MuPDF，可以在多个线程中同时运行。
+
+    JPEG 和 PNG 直接嵌入，WebP 在内存中重新编码后嵌入，其他格式之后由 MuPDF 转换，都不会产生临时文件。
+    超出 options 中分辨率或尺寸限制的图像会被缩小并重新编码，没有超出的图像保持原样。
+    带有 EXIF 方向的 JPEG 不能直接嵌入，由 MuPDF 转换，缩小时则在重新编码前旋转。
+    :param img_path: 图像路径，archive 不为 None 时为压缩包中的虚拟路径
+    :param options: page_options 返回的设置，为 None 时按原样嵌入
+    :param archive: 图像所在的压缩包，成员被读入内存，不会解压到磁盘
+    :return: 准备好的页面
+    """
+    options = options or page_options()
+    data = archive.read(_member_name(archive.filename, img_path)) if archive is not None else None
+    with Image.open(img_path if data is None else io.BytesIO(data)) as image:
+        width, height = _page_size(image)
+        if options["page_width"] > 0:
+            width, height = options["page_width"], height * options["page_width"] / width
+        target = _target_pixels(image, width, options)
+        # 多帧图像只有第一帧能被缩小，保持由 MuPDF 转换全部帧
+        if target and getattr(image, "n_frames", 1) == 1:
+            lossless = image.format in LOSSLESS_FORMATS or \
+                       (image.format == "WEBP" and _is_lossless_webp(img_path, data))
+            if image.mode in ("1", "P"):
+                # 这两种模式缩放时只能使用最近邻
+                image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+            # thumbnail 会先尝试 draft 和 reduce，JPEG 在解码时直接缩小
+            orientation = _orientation(image)
+            image.thumbnail(target, resample=PNG2JPG.RESAMPLE_FILTERS[options["resample"]],
+                            reducing_gap=PNG2JPG.REDUCING_GAP)
+            if orientation != 1:
+                image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+            stream = _encode_page(image, lossless, options["quality"])
+            logger.debug(f"已缩小 {img_path}：{image.size}")
+            return PreparedPage(path=img_path, mode="stream", width=width, height=height, stream=stream)
+        if image.format in EMBED_FORMATS and _orientation(image) == 1:
+            return PreparedPage(path=img_path, mode="embed", width=width, height=height, stream=data)
+        if image.format in REENCODE_FORMATS:
+            stream = _encode_page(image, _is_lossless_webp(img_path, data))
+            return PreparedPage(path=img_path, mode="stream", width=width, height=height, stream=stream)
+    return PreparedPage(path=img_path, mode="convert", width=width, height=height, stream=data)
+
+
+def _iter_prepared(image_paths: Iterable[str], page_workers: int, options: dict | None = None,
+                   archive: zipfile.ZipFile | None = None) -> Generator[PreparedPage, None, None]:
     """
-    将一个图像序列转换为一个PDF文件。
+    按原顺序产出准备好的页面，page_workers 大于1时在线程池中并行准备。
 
-    :return: 元组，第一项是错误码，后面的列表为遇到webp，转换后文件路径的列表
+    已提交的页面不超过 page_workers * REORDER_DEPTH 个，前面的页面尚未完成时，后面已完成的页面会在缓冲区中等待。
+    :param image_paths: 图像路径
+    :param page_workers: 线程数
+    :param options: page_options 返回的设置
+    :param archive: 图像所在的压缩包，可以被多个线程同时读取
+    :return: 生成器，每项为一个准备好的页面
+    """
+    if page_workers <= 1:
+        for img_path in image_paths:
+            yield _prepare_page(img_path, options, archive)
+        return None
+
+    path_iter = iter(image_paths)
+    executor = ThreadPoolExecutor(max_workers=page_workers)
+    try:
+        pending = deque(executor.submit(_prepare_page, img_path, options, archive)
+                        for img_path in islice(path_iter, page_workers * REORDER_DEPTH))
+        while pending:
+            page = pending.popleft().result()
+            next_path = next(path_iter, None)
+            if next_path is not None:
+                pending.append(executor.submit(_prepare_page, next_path, options, archive))
+            yield page
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _insert_page(pdf_document: fitz.Document, page_info: PreparedPage):
+    """
+    将准备好的页面添加到PDF末尾，页面尺寸为 _prepare_page 计算的尺寸。
+
+    :param pdf_document: 目标PDF
+    :param page_info: _prepare_page 返回的页面
+    """
+    if page_info["mode"] == "convert":
+        if page_info["stream"] is None:
+            img_doc = fitz.open(page_info["path"])
+        else:
+            img_doc = fitz.open(stream=page_info["stream"], filetype=os.path.splitext(page_info["path"])[1][1:])
+        with img_doc, fitz.open("pdf", img_doc.convert_to_pdf()) as img_pdf:
+            scale = page_info["width"] / img_pdf[0].rect.width
+            if abs(scale - 1) < 1e-3:
+                pdf_document.insert_pdf(img_pdf)
+            else:
+                # 统一了页面宽度，每一帧按比例缩放到新页面上
+                for frame in img_pdf:
+                    page = pdf_document.new_page(width=frame.rect.width * scale, height=frame.rect.height * scale)
+                    page.show_pdf_page(page.rect, img_pdf, frame.number)
+        return None
+    page = pdf_document.new_page(width=page_info["width"], height=page_info["height"])
+    if page_info["stream"] is None:
+        page.insert_image(page.rect, filename=page_info["path"])
+    else:
+        page.insert_image(page.rect, stream=page_info["stream"])
+    return None
+
+
+def _default_output_path(sequence_info: SequenceInfo, output_format: str = "pdf") -> str:
+    """
+    序列对应的输出路径，位于序列文件夹的上一级，以文件夹命名。
+
+    压缩包中的序列输出到压缩包旁边，以压缩包的文件名（不含扩展名）命名，位于压缩包内的子文件夹时再加上子文件夹的路径
     """
     folder_path = sequence_info["folder"]
+    if sequence_info["archive"]:
+        archive_path = sequence_info["archive"]
+        name = os.path.splitext(os.path.basename(archive_path))[0]
+        if folder_path != archive_path:
+            name = f"{name}_{_member_name(archive_path, folder_path).replace('/', '_')}"
+        return os.path.join(os.path.dirname(archive_path), f"{name}.{output_format}")
+    return os.path.join(os.path.dirname(folder_path), f"{os.path.basename(folder_path)}.{output_format}")
+
+
+def _sequence_key(sequence_info: SequenceInfo) -> str:
+    """序列的标识，由文件名的前缀和扩展名组成，用于区分同一文件夹中的多个序列"""
+    prefix, _, extension = SEQUENCE_PATTERN.match(os.path.basename(sequence_info["sequence"][0])).groups()
+    return f"{prefix}*{extension}"
+
+
+def _build_manifest(sequence_info: SequenceInfo, pages: List[str], options: dict | None) -> bytes:
+    """
+    生成页面来源清单
+
+    :param sequence_info: 图像序列信息
+    :param pages: PDF中每一页对应的源文件名，按页面顺序排列
+    :param options: 生成页面时使用的 page_options 设置
+    :return: JSON 数据
+    """
+    manifest = {"version": MANIFEST_VERSION, "folder": os.path.basename(sequence_info["folder"]),
+                "key": _sequence_key(sequence_info), "pages": pages, "options": options or page_options()}
+    return json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+
+
+def _read_manifest(pdf_path: str) -> dict | None:
+    """
+    读取PDF中嵌入的页面来源清单，只读取清单本身，不加载页面
+
+    :param pdf_path: PDF路径
+    :return: 清单字典，PDF无法打开、不是本工具生成或版本不同时为 None
+    """
+    try:
+        with fitz.open(pdf_path) as pdf_document:
+            if MANIFEST_NAME not in pdf_document.embfile_names():
+                return None
+            manifest = json.loads(pdf_document.embfile_get(MANIFEST_NAME))
+    except Exception as e:
+        logger.debug(f"无法读取 {pdf_path} 的页面来源清单：{str(e)}")
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def _find_appendable(sequence_info: SequenceInfo, siblings: List[str], reserved: set) -> str:
+    """
+    查找由同一序列生成、可以追加页面的PDF，分卷的PDF以第一卷的清单判断
+
+    :param sequence_info: 图像序列信息
+    :param siblings: 输出文件夹中的文件名
+    :param reserved: 已分配给其他序列的路径
+    :return: 生成时使用的输出路径，分卷时为去掉卷号的路径，见 _existing_volumes；没有找到时为空字符串
+    """
+    default_path = _default_output_path(sequence_info)
+    name, ext = os.path.splitext(os.path.basename(default_path))
+    pattern = re.compile(f"^{re.escape(name)}(_\\d+)?(_vol\\d{{3}})?{re.escape(ext)}$")
+    folder_name = os.path.basename(sequence_info["folder"])
+    key = _sequence_key(sequence_info)
+    for filename in sorted(siblings):
+        match = pattern.match(filename)
+        if not match or match.group(2) not in (None, "_vol001"):
+            continue
+        output_path = os.path.join(os.path.dirname(default_path), f"{name}{match.group(1) or ''}{ext}")
+        if output_path in reserved:
+            continue
+        manifest = _read_manifest(os.path.join(os.path.dirname(default_path), filename))
+        if manifest and manifest["folder"] == folder_name and manifest["key"] == key:
+            return output_path
+    return ""
+
+
+def _plan_output_paths(sequences: List[SequenceInfo], append: bool = False,
+                       output_format: str = "pdf") -> List[str]:
+    """
+    在开始转换前为所有序列分配互不相同的输出路径。
+
+    并行转换时各个序列的输出同时写入，同一文件夹中的多个序列不能再依靠写入顺序来避免重名。
+    :param sequences: 序列列表
+    :param append: 为 True 时，已有的由同一序列生成的PDF会被再次分配给该序列，只对PDF有效
+    :param output_format: 输出格式，见 OUTPUT_FORMATS
+    :return: 与序列一一对应的输出路径
+    """
+    reserved = set()
+    outputs = []
+    # 追加模式下每个输出文件夹只列出一次
+    listings: Dict[str, List[str]] = {}
+    for sequence_info in sequences:
+        default_path = _default_output_path(sequence_info, output_format)
+        if append and output_format == "pdf":
+            parent = os.path.dirname(default_path)
+            if parent not in listings:
+                try:
+                    listings[parent] = os.listdir(parent)
+                except OSError:
+                    listings[parent] = []
+            existing = _find_appendable(sequence_info, listings[parent], reserved)
+            if existing:
+                reserved.add(existing)
+                outputs.append(existing)
+                continue
+        output_path = utils.get_unique_filename(default_path)[1]
+        name, ext = os.path.splitext(default_path)
+        index = 1
+        while output_path in reserved or os.path.exists(output_path):
+            output_path = f"{name}_{index}{ext}"
+            index += 1
+        reserved.add(output_path)
+        outputs.append(output_path)
+    return outputs
+
+
+def _page_bytes(page_info: PreparedPage) -> int:
+    """页面嵌入PDF后的大致字节数，重新编码的页面按编码结果计算，其余按源文件大小计算"""
+    return len(page_info["stream"]) if page_info["stream"] is not None else os.path.getsize(page_info["path"])
+
+
+def _volume_path(output_path: str, number: int) -> str:
+    """第 number 卷的PDF路径，在 output_path 的文件名后添加卷号，重名时添加序号"""
+    name, ext = os.path.splitext(output_path)
+    return utils.get_unique_filename(f"{name}_vol{number:03d}{ext}")[1]
+
+
+def _existing_volumes(output_path: str) -> List[str]:
+    """
+    已经由 output_path 生成的PDF
+
+    :param output_path: 生成时使用的输出路径
+    :return: output_path 本身存在时只包含它，否则为按卷号排列的连续分卷，都不存在时为空列表
+    """
+    if os.path.exists(output_path):
+        return [output_path]
+    name, ext = os.path.splitext(output_path)
+    volumes = []
+    while os.path.exists(volume := f"{name}_vol{len(volumes) + 1:03d}{ext}"):
+        volumes.append(volume)
+    return volumes
+
+
+def _save_volume(pdf_document: fitz.Document, sequence_info: SequenceInfo, pages: List[str],
+                 options: dict | None, output_path: str, garbage: int, deflate: bool):
+    """嵌入页面来源清单后保存并关闭PDF，释放其占用的内存"""
+    pdf_document.embfile_add(MANIFEST_NAME, _build_manifest(sequence_info, pages, options))
+    pdf_document.save(output_path, garbage=garbage, deflate=deflate)
+    pdf_document.close()
+
+
+def _open_archive(sequence_info: SequenceInfo):
+    """序列位于压缩包中时以只读方式打开该压缩包，否则返回值为 None 的空上下文"""
+    return zipfile.ZipFile(sequence_info["archive"]) if sequence_info["archive"] else nullcontext()
+
+
+def _source_size(img_path: str, archive: zipfile.ZipFile | None) -> int:
+    """源文件的字节数，位于压缩包中时为成员解压后的大小"""
+    if archive is None:
+        return os.path.getsize(img_path)
+    return archive.getinfo(_member_name(archive.filename, img_path)).file_size
+
+
+def _open_source(img_path: str, archive: zipfile.ZipFile | None):
+    """以二进制只读方式打开源文件，位于压缩包中时打开对应的成员"""
+    return open(img_path, "rb") if archive is None else archive.open(_member_name(archive.filename, img_path))
+
+
+def _insert_pages(pdf_document: fitz.Document, image_paths: List[str], page_workers: int,
+                  options: dict | None, archive: zipfile.ZipFile | None = None):
+    """按序列顺序将图像添加到PDF末尾，页面的准备可以在线程池中并行进行"""
+    with closing(_iter_prepared(image_paths, page_workers, options, archive)) as pages:
+        for page_info in pages:
+            # 追加图像
+            _insert_page(pdf_document, page_info)
+
+
+def _frame_number(filename: str) -> int:
+    """帧文件名中的序号"""
+    return int(SEQUENCE_PATTERN.match(filename).group(2))
+
+
+def _append_breaks_order(sequence_info: SequenceInfo, volumes: List[str]) -> bool:
+    """
+    检查新的帧追加到末尾后页面顺序是否会与序列不同，且能否重新生成
+
+    新的帧中有序号小于已有的最后一页的（例如补拍的帧）时，追加会打乱顺序。
+    已有页面的源文件都还在时返回 True，由调用方重新生成；否则只能追加，记录一条警告后返回 False
+    :param sequence_info: 图像序列信息
+    :param volumes: 已有的PDF，按卷号排列
+    :return: 是否需要重新生成
+    """
+    manifests = [_read_manifest(volume) for volume in volumes]
+    if None in manifests:
+        # 交给 _append_to_pdf 报告错误
+        return False
+    known = {page for manifest in manifests for page in manifest["pages"]}
+    if not known:
+        return False
+    last = max(_frame_number(page) for page in known)
+    names = [os.path.basename(path) for path in sequence_info["sequence"]]
+    late = [name for name in names if name not in known and _frame_number(name) < last]
+    if not late:
+        return False
+    if known.issubset(names):
+        logger.warning(f"{late[0]} 等 {len(late)} 帧的序号小于 {volumes[-1]} 的最后一页，将重新生成以保持页面顺序")
+        return True
+    logger.warning(f"{late[0]} 等 {len(late)} 帧的序号小于 {volumes[-1]} 的最后一页，但部分已有页面的源文件已不存在，"
+                   f"无法重新生成，这些帧将被追加到末尾，页面顺序与序列不同")
+    return False
+
+
+def _append_to_pdf(sequence_info: SequenceInfo, volumes: List[str], page_workers: int,
+                   options: dict | None) -> tuple[ErrorCode, str]:
+    """
+    将序列中尚未出现在PDF里的帧追加到已有PDF末尾，增量保存，只有新的页面会被写入。
+
+    已分卷时，所有分卷中的页面都算作已有的帧，新的帧追加到最后一卷，不再按分卷设置拆分。
+    :param sequence_info: 图像序列信息
+    :param volumes: 已有的PDF，按卷号排列，每一卷都必须包含页面来源清单
+    :param page_workers: 准备页面的线程数
+    :param options: page_options 返回的页面设置
+    :return: 元组，第一项是错误码，第二项是PDF的路径，分卷时为第一卷的路径
+    """
+    manifests = [_read_manifest(volume) for volume in volumes]
+    if None in manifests:
+        logger.error(f"无法追加到 {volumes[manifests.index(None)]}：没有找到页面来源清单")
+        return ErrorCode.InvalidArgument, volumes[0]
+    known = {page for volume_manifest in manifests for page in volume_manifest["pages"]}
+    pdf_path, manifest = volumes[-1], manifests[-1]
+    if manifest["options"] != (options or page_options()):
+        logger.warning(f"{pdf_path} 的页面设置与本次不同，新页面将使用本次的设置")
+    new_paths = [path for path in sequence_info["sequence"] if os.path.basename(path) not in known]
+    if not new_paths:
+        logger.info(f"{volumes[0]} 已包含序列的全部帧，无需追加")
+        return ErrorCode.Success, volumes[0]
+
+    start = time.perf_counter()
+    with fitz.open(pdf_path) as pdf_document, _open_archive(sequence_info) as archive:
+        _insert_pages(pdf_document, new_paths, page_workers, options, archive)
+        pages = manifest["pages"] + [os.path.basename(path) for path in new_paths]
+        # embfile_upd 在部分 PyMuPDF 版本中无法接收 bytes，删除后重新添加
+        pdf_document.embfile_del(MANIFEST_NAME)
+        pdf_document.embfile_add(MANIFEST_NAME, _build_manifest(sequence_info, pages, options))
+        # 增量保存只在文件末尾写入新的对象，不重写已有页面
+        pdf_document.save(pdf_path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+    elapsed = time.perf_counter() - start
+    logger.info(f"已向 {pdf_path} 追加 {len(new_paths)} 页，共 {len(pages)} 页，"
+                f"{len(new_paths) / elapsed if elapsed else 0.0:.1f} 页/秒")
+    return ErrorCode.Success, volumes[0]
+
+
+def create_pdf_from_sequence(sequence_info: SequenceInfo, garbage: int = 0, deflate: bool = True,
+                             output_path: str = "", page_workers: int = 1,
+                             options: dict | None = None, append: bool = False, max_pages: int = 0,
+                             max_bytes: int = 0) -> tuple[ErrorCode, str]:
+    """
+    将一个图像序列转换为一个PDF文件，也会被进程池调用。
+
+    所有页面先在内存中组装，最后只写入一次磁盘，写入耗时与页数成线性关系。
+    页面的解码和重新编码可以在线程池中并行进行，插入PDF仍按序列顺序在当前线程中进行。
+    PDF中会嵌入页面来源清单，之后可以用追加模式只添加新的帧。
+    设置了 max_pages 或 max_bytes 时，序列被分为多卷，每一卷保存并关闭后才开始下一卷，内存占用不随序列长度增长。
+    分卷时各卷以 名称_vol001.pdf 的形式命名，只有一卷时仍使用 output_path。
+    序列位于压缩包中时，成员被直接读入内存，不会解压到磁盘。
+    :param sequence_info: 图像序列信息
+    :param garbage: 保存时的垃圾回收级别（0-4），级别越高文件越小，保存越慢
+    :param deflate: 保存时是否压缩未压缩的数据流
+    :param output_path: PDF的路径，为空时在序列文件夹的上一级以文件夹命名，重名时添加序号
+    :param page_workers: 准备页面的线程数，1 为逐页准备
+    :param options: page_options 返回的页面设置，为 None 时按原样嵌入
+    :param append: output_path 或其分卷已存在时，只将新的帧追加到最后一卷末尾，此时 garbage、deflate 和分卷设置不生效。
+        新的帧会打乱页面顺序时改为重新生成，旧的PDF在新的保存完成后才被删除
+    :param max_pages: 每卷的最大页数，0 为不限制
+    :param max_bytes: 每卷的最大字节数，按嵌入的图像数据估算，0 为不限制。单个页面超过此值时独占一卷
+    :return: 元组，第一项是错误码，第二项是PDF的路径，分卷时为第一卷的路径
+    """
     image_paths = sequence_info["sequence"]
-    extras = []
+    folder_name = os.path.basename(sequence_info["folder"])
 
     # 输出PDF路径
-    parent_dir = os.path.dirname(folder_path)
-    folder_name = os.path.basename(folder_path)
-    output_path = utils.get_unique_filename(os.path.join(parent_dir, f"{folder_name}.pdf"))
-    logger.debug(f"正在创建PDF: {output_path[1]}, 源文件数: {len(image_paths)}")
+    output_path = output_path or utils.get_unique_filename(_default_output_path(sequence_info))[1]
 
+    # 重新生成时暂时改名保留的旧PDF：(原路径, 临时路径)
+    stashed = []
     try:
+        volumes = _existing_volumes(output_path) if append else []
+        if volumes and not _append_breaks_order(sequence_info, volumes):
+            if len(volumes) > 1 or max_pages or max_bytes:
+                logger.info(f"追加模式下不再分卷，新的帧将追加到 {volumes[-1]}")
+            return _append_to_pdf(sequence_info, volumes, page_workers, options)
+        for volume in volumes:
+            stashed.append((volume, os.path.join(os.path.dirname(volume), f".{os.path.basename(volume)}.old")))
+            os.replace(*stashed[-1])
+
+        logger.debug(f"正在创建PDF: {output_path}, 源文件数: {len(image_paths)}")
         pdf_document = fitz.open()
+        start = time.perf_counter()
+        volumes = []
+        pages = []
+        volume_bytes = 0
 
-        for img_path in image_paths:
-            # 针对webp的转换
-            if img_path.endswith(".webp"):
-                res = PNG2JPG.convert_single(img_path, 80, False, 2, "webp")
-                if res[0] == ErrorCode.Success:
-                    img_path = res[1]
-                    extras.append(res[1])
-                    logger.debug(f"已将webp文件转换为 {img_path} ，当前extras列表：{extras}")
-                else:
-                    logger.error(res[0].generic)
-                    return res[0], extras
-            # 追加图像
-            img_doc = fitz.open(img_path)
-            pdf_bytes = img_doc.convert_to_pdf()
-            img_pdf = fitz.open("pdf", pdf_bytes)
-            pdf_document.insert_pdf(img_pdf)
-            img_pdf.close()
-            img_doc.close()
-            # 保存 PDF
-            pdf_document.save(output_path[1])
-
-        logger.info(f"成功创建PDF: {output_path[1]}")
-        pdf_document.close()
-        return ErrorCode.Success, extras
+        with _open_archive(sequence_info) as archive, \
+                closing(_iter_prepared(image_paths, page_workers, options, archive)) as prepared:
+            for page_info in prepared:
+                page_bytes = _page_bytes(page_info)
+                # 当前卷已满 - 保存并释放，再开始新的一卷
+                if pages and ((0 < max_pages <= len(pages)) or (0 < max_bytes < volume_bytes + page_bytes)):
+                    volumes.append(_volume_path(output_path, len(volumes) + 1))
+                    _save_volume(pdf_document, sequence_info, pages, options, volumes[-1], garbage, deflate)
+                    logger.debug(f"已保存分卷: {volumes[-1]}，共 {len(pages)} 页")
+                    pdf_document = fitz.open()
+                    pages = []
+                    volume_bytes = 0
+                # 追加图像
+                _insert_page(pdf_document, page_info)
+                pages.append(os.path.basename(page_info["path"]))
+                volume_bytes += page_bytes
+
+        # 保存 PDF
+        volumes.append(_volume_path(output_path, len(volumes) + 1) if volumes else output_path)
+        _save_volume(pdf_document, sequence_info, pages, options, volumes[-1], garbage, deflate)
+        elapsed = time.perf_counter() - start
+        logger.info(f"成功创建PDF: {volumes[0]}，共 {len(image_paths)} 页，{len(volumes)} 卷，"
+                    f"{len(image_paths) / elapsed if elapsed else 0.0:.1f} 页/秒")
     except Exception as e:
         logger.error(f"无法创建PDF ({folder_name}): {str(e)}")
-        return ErrorCode.Unknown, extras
+        # 恢复旧的PDF
+        for original, temp_path in stashed:
+            try:
+                os.replace(temp_path, original)
+            except OSError:
+                logger.error(ErrorCode.CannotWriteFile.format(original))
+        return ErrorCode.Unknown, output_path
+
+    for _, temp_path in stashed:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            logger.warning(ErrorCode.CannotDelTempFile.format(temp_path))
+    return ErrorCode.Success, volumes[0]
+
+
+def create_archive_from_sequence(sequence_info: SequenceInfo, output_path: str = "") -> tuple[ErrorCode, str]:
+    """
+    将一个图像序列不经转换地打包为 CBZ（不压缩的 ZIP），也会被进程池调用。
+
+    图像的原始数据被分块复制到压缩包中，不解码也不重新压缩，耗时接近复制文件。
+    压缩包内的文件按序列顺序以补零的序号命名，阅读器按文件名排序时页面顺序不变。
+    序列本身位于压缩包中时，成员同样被分块复制，不会解压到磁盘。
+    :param sequence_info: 图像序列信息
+    :param output_path: 压缩包的路径，为空时在序列文件夹的上一级以文件夹命名，重名时添加序号
+    :return: 元组，第一项是错误码，第二项是压缩包的路径
+    """
+    image_paths = sequence_info["sequence"]
+    output_path = output_path or utils.get_unique_filename(_default_output_path(sequence_info, "cbz"))[1]
+    width = len(str(len(image_paths)))
+    logger.debug(f"正在创建CBZ: {output_path}, 源文件数: {len(image_paths)}")
+
+    start = time.perf_counter()
+    try:
+        with _open_archive(sequence_info) as source, \
+                zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as archive:
+            archive.comment = ARCHIVE_COMMENT
+            for index, img_path in enumerate(image_paths, 1):
+                arcname = f"{index:0{width}d}{os.path.splitext(img_path)[1].lower()}"
+                with _open_source(img_path, source) as src, archive.open(arcname, "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    except Exception as e:
+        logger.error(f"无法创建CBZ ({os.path.basename(sequence_info['folder'])}): {str(e)}")
+        # 不留下不完整的压缩包
+        if os.path.exists(output_path):
+            try:
+                os.remove(output_path)
+            except OSError:
+                logger.warning(ErrorCode.CannotDelTempFile.format(output_path))
+        return ErrorCode.Unknown, output_path
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"成功创建CBZ: {output_path}，共 {len(image_paths)} 页，"
+                f"{len(image_paths) / elapsed if elapsed else 0.0:.1f} 页/秒")
+    return ErrorCode.Success, output_path
 
 
-def cleanup_original_files(sequence_info: SequenceInfo, send_to_trash_flag: bool, extras: list[str]) -> ErrorCode:
+def run_settings(output_format: str = "pdf", garbage: int = 0, deflate: bool = True, options: dict | None = None,
+                 append: bool = False, max_pages: int = 0, max_bytes: int = 0) -> dict:
     """
-    根据用户选择和文件夹内容，将原文件或文件夹发送到回收站。
+    汇总会影响输出内容的设置，既用于生成输出，也保存在转换计划中，参数见 process_image_sequences
 
-    :return: ErrorCode 表示操作结果
+    :return: 设置字典
     """
-    if not send_to_trash_flag:
-        logger.debug("跳过清理：未启用发送到回收站")
-        return ErrorCode.Success
+    return {"output_format": output_format, "garbage": garbage, "deflate": deflate, "options": options,
+            "append": append, "max_pages": max_pages, "max_bytes": max_bytes}
 
+
+def _build_output(sequence_info: SequenceInfo, output_path: str, page_workers: int,
+                  settings: dict) -> tuple[ErrorCode, str]:
+    """按输出格式生成单个序列的输出，也会被进程池调用，settings 为 run_settings 返回的设置"""
+    if settings["output_format"] == "cbz":
+        return create_archive_from_sequence(sequence_info, output_path)
+    pdf_settings = {key: value for key, value in settings.items() if key != "output_format"}
+    return create_pdf_from_sequence(sequence_info, output_path=output_path, page_workers=page_workers,
+                                    **pdf_settings)
+
+
+def _trash_targets(sequence_info: SequenceInfo) -> List[str]:
+    """
+    清理序列时要移至回收站的路径。
+
+    序列文件是文件夹的所有内容且没有子文件夹时为整个文件夹，否则为序列文件。
+    压缩包中的序列只有在其为压缩包的全部内容时才会清理，此时为整个压缩包，压缩包中的单个文件不会被删除。
+    :param sequence_info: 图像序列信息
+    :return: 路径列表，无法清理时为空列表
+    """
     folder_path = sequence_info["folder"]
     sequence_files = set(sequence_info["sequence"])
     all_items_in_folder = set(sequence_info["all_files"])
     has_subfolder = sequence_info["has_subfolder"]
 
-    # 移除额外文件
-    if extras:
-        try:
-            extras = [os.path.normpath(item) for item in extras]
-            send2trash.send2trash(extras)
-            logger.info(f"已将 {len(extras)} 项额外文件移动到回收站")
-        except Exception as e:
-            logger.error(ErrorCode.CannotDelTempFile.format(str(e)))
-            return ErrorCode.CannotDelTempFile
+    # 压缩包中的序列不是压缩包的全部内容 - 无法只删除其中的一部分
+    if sequence_info["archive"] and not (folder_path == sequence_info["archive"] and
+                                         sequence_files == all_items_in_folder and not has_subfolder):
+        logger.info(f"跳过清理：{sequence_info['archive']} 中还有序列以外的内容")
+        return []
 
     # 序列文件是文件夹的所有内容，且没有子文件夹 - 直接删除父文件夹更快
     if sequence_files == all_items_in_folder and not has_subfolder:
+        return [os.path.normpath(folder_path)]
+    return [os.path.normpath(i) for i in sequence_info["sequence"]]
+
+
+class TrashQueue:
+    """
+    在后台线程中批量将路径移至回收站，与后续序列的生成同时进行。
+
+    路径先在队列中累积，达到 batch_size 或超过 wait_seconds 没有新路径时，用一次 send2trash 调用处理整批路径，
+    一批失败时逐个重试。只应放入输出已保存完成的序列。
+    """
+
+    def __init__(self, batch_size: int = TRASH_BATCH_SIZE, wait_seconds: float = TRASH_WAIT_SECONDS):
+        self.batch_size = batch_size
+        self.wait_seconds = wait_seconds
+        self.trashed = 0
+        self.failed = 0
+        self._queue: queue.Queue[List[str] | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def put(self, paths: List[str]):
+        """
+        将一个序列的路径加入队列，第一次调用时启动后台线程
+
+        :param paths: _trash_targets 返回的路径
+        """
+        if not paths:
+            return None
+        if self._thread is None:
+            # 延迟到第一个序列完成时才启动，此时进程池已经创建了全部进程，fork 时不会复制持有锁的线程
+            self._thread = threading.Thread(target=self._run, name="TrashQueue", daemon=True)
+            self._thread.start()
+        self._queue.put(paths)
+        return None
+
+    def close(self) -> int:
+        """
+        清理队列中剩余的路径，等待后台线程结束
+
+        :return: 无法移至回收站的路径数
+        """
+        if self._thread is None:
+            return 0
+        self._queue.put(None)
+        self._thread.join()
+        logger.info(f"清理完成，已移至回收站 {self.trashed} 项，失败 {self.failed} 项")
+        return self.failed
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.wait_seconds if batch else None)
+            except queue.Empty:
+                # 一段时间没有新路径 - 先清理已收集的路径
+                item = []
+            if item:
+                batch.extend(item)
+                if len(batch) < self.batch_size:
+                    continue
+            self._flush(batch)
+            batch = []
+            if item is None:
+                return None
+
+    def _flush(self, batch: List[str]):
+        if not batch:
+            return None
         try:
-            norm_path = os.path.normpath(folder_path)
-            send2trash.send2trash(norm_path)
-            logger.info(f"文件夹已移至回收站: {norm_path}")
-            return ErrorCode.Success
+            send2trash.send2trash(batch)
+            self.trashed += len(batch)
+            logger.debug(f"已批量移至回收站，共 {len(batch)} 项")
+            return None
         except Exception as e:
-            logger.error(f"无法删除序列文件夹: {str(e)}")
-            return ErrorCode.CannotDelInputFile
-    else:
+            logger.warning(f"批量移至回收站失败，将逐个重试: {str(e)}")
+        for path in batch:
+            try:
+                send2trash.send2trash(path)
+                self.trashed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(ErrorCode.TrashFailed.format(f"{path}，{str(e)}"))
+        return None
+
+
+def _finish_sequence(index: int, sequence_info: SequenceInfo, res: tuple[ErrorCode, str],
+                     trash: TrashQueue | None) -> ErrorCode:
+    """
+    处理单个序列的转换结果，只有输出已经保存完成的序列才会被加入清理队列。
+
+    :param index: 序列的序号，从1开始
+    :param sequence_info: 图像序列信息
+    :param res: _build_output 的返回值
+    :param trash: 清理队列，为 None 时不清理
+    :return: 转换的错误码，清理失败只会记录警告
+    """
+    if res[0] != ErrorCode.Success:
+        logger.warning(f"序列 {index} 处理失败，跳过清理")
+        return res[0]
+
+    # 清理原文件
+    if trash is not None:
+        trash.put(_trash_targets(sequence_info))
+    return ErrorCode.Success
+
+
+def _run_sequences(sequences: List[SequenceInfo], settings: dict, send_to_trash: bool, workers: int,
+                   page_workers: int) -> Generator[tuple[ErrorCode, int], None, None]:
+    """
+    为已找到的序列生成输出，由 process_image_sequences 和 execute_plan 共用，参数见 process_image_sequences
+
+    需要清理时，输出保存完成的序列被放入 TrashQueue，在后台批量移至回收站，与后续序列的生成同时进行。
+    生成器结束或被关闭时，队列中剩余的路径会被清理完毕。
+    :return: 包含状态码和进度的生成器
+    """
+    seq_length = len(sequences)
+
+    if not sequences:
+        logger.info("未找到任何符合条件的图像序列")
+        yield ErrorCode.Success, 100
+        return None
+
+    outputs = _plan_output_paths(sequences, settings["append"], settings["output_format"])
+    trash = TrashQueue() if send_to_trash else None
+
+    try:
+        # 逐个处理序列
+        if workers <= 1 or seq_length == 1:
+            for i, (seq_info, output_path) in enumerate(zip(sequences, outputs), 1):
+                progress = int((i / seq_length) * 100)
+                res = _build_output(seq_info, output_path, page_workers, settings)
+                yield _finish_sequence(i, seq_info, res, trash), progress
+            return None
+
+        # 并行处理序列
+        logger.info(f"使用 {workers} 个进程生成PDF")
+        tasks = enumerate(zip(sequences, outputs), 1)
+        threads_per_process = max(1, page_workers // workers)
+        finished = 0
+        executor = ProcessPoolExecutor(max_workers=workers)
         try:
-            files_to_trash = [os.path.normpath(i) for i in sequence_info["sequence"]]
-            send2trash.send2trash(files_to_trash)
-            logger.info(f"序列文件已移至回收站，共 {len(files_to_trash)} 个文件")
-            return ErrorCode.Success
-        except Exception as e:
-            logger.error(f"无法删除序列文件: {str(e)}")
-            return ErrorCode.CannotDelInputFile
+            pending = {}
+            while True:
+                for i, (seq_info, output_path) in tasks:
+                    future = executor.submit(_build_output, seq_info, output_path, threads_per_process, settings)
+                    pending[future] = i, seq_info
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, seq_info = pending.pop(future)
+                    finished += 1
+                    progress = int((finished / seq_length) * 100)
+                    try:
+                        res = future.result()
+                    except Exception as e:
+                        # 进程池本身损坏，后续序列也无法完成
+                        logger.error(f"生成PDF的进程异常退出: {str(e)}")
+                        yield ErrorCode.Unknown, progress
+                        return None
+                    yield _finish_sequence(i, seq_info, res, trash), progress
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if trash is not None and trash.close():
+            logger.warning(f"有 {trash.failed} 项无法移至回收站")
 
+    return None
 
-def process_image_sequences(target_folder: str, recursive: bool = False,
-                            send_to_trash: bool = False) -> Generator[tuple[ErrorCode, int], None, None]:
+
+def process_image_sequences(target_folder: str, recursive: bool = False, send_to_trash: bool = False,
+                            garbage: int = 0, deflate: bool = True, workers: int = 1,
+                            page_workers: int = 1, options: dict | None = None,
+                            append: bool = False, max_pages: int = 0,
+                            max_bytes: int = 0,
+                            output_format: str = "pdf",
+                            archives: bool = False) -> Generator[tuple[ErrorCode, int], None, None]:
     """
     处理图像序列转PDF的主函数。
 
+    workers 大于1时，序列被分配到进程池中，每个进程一次生成一个PDF或压缩包，结果按完成顺序产出，
+    同时提交的序列数量不超过进程数的两倍。清理在主进程中进行，每个序列只会在其输出保存完成后被清理。
+    关闭生成器时，尚未开始的序列会被取消。只有一个序列时不使用进程池，页面线程数按进程数平均分配。
+
+    :param garbage: 保存PDF时的垃圾回收级别，见 create_pdf_from_sequence
+    :param deflate: 保存PDF时是否压缩数据流
+    :param workers: 进程数
+    :param page_workers: 准备页面的线程总数，使用进程池时每个进程分得 page_workers // workers 个
+    :param options: page_options 返回的页面设置，见 create_pdf_from_sequence
+    :param append: 为 True 时，已有的由同一序列生成的PDF只追加新的帧，而不是生成带序号的新PDF
+    :param max_pages: 每卷的最大页数，见 create_pdf_from_sequence
+    :param max_bytes: 每卷的最大字节数，见 create_pdf_from_sequence
+    :param output_format: 输出格式，见 OUTPUT_FORMATS。cbz 只打包原始文件，页面、追加和分卷设置不生效
+    :param archives: 是否将 ZIP/CBZ 压缩包当作文件夹查找序列，压缩包中的图像不会被解压到磁盘
     :return: 包含状态码和进度的生成器
     """
+    if output_format not in OUTPUT_FORMATS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的输出格式 {output_format}"))
+        yield ErrorCode.InvalidArgument, 0
+        return None
+
     # 查找所有图像序列
-    error_code, sequences = find_image_sequences(target_folder, recursive)
+    error_code, sequences = find_image_sequences(target_folder, recursive, archives)
 
     if error_code != ErrorCode.Success:
         logger.error(f"初始化扫描失败: {error_code.generic}")
         yield error_code, 0
         return None
 
-    seq_length = len(sequences)
+    settings = run_settings(output_format, garbage, deflate, options, append, max_pages, max_bytes)
+    yield from _run_sequences(sequences, settings, send_to_trash, workers, page_workers)
+    return None
 
-    if not sequences:
-        logger.info("未找到任何符合条件的图像序列")
-        yield ErrorCode.Success, 100
-        return None
 
-    # 处理每个序列
-    for i, seq_info in enumerate(sequences, 1):
-        progress = int((i / seq_length) * 100)
+def _probe_sequence(sequence_info: SequenceInfo) -> dict:
+    """
+    只读取序列中每个图像的头部，统计页数、字节数、像素数和格式，不解码像素。
 
-        res = create_pdf_from_sequence(seq_info)
+    :param sequence_info: 图像序列信息
+    :return: 统计结果，无法读取的图像计入 failed
+    """
+    stats = {"pages": len(sequence_info["sequence"]), "input_bytes": 0, "pixels": 0, "formats": {}, "failed": 0}
+    with _open_archive(sequence_info) as archive:
+        for img_path in sequence_info["sequence"]:
+            try:
+                stats["input_bytes"] += _source_size(img_path, archive)
+                with _open_source(img_path, archive) as source, Image.open(source) as image:
+                    stats["pixels"] += image.width * image.height
+                    stats["formats"][image.format] = stats["formats"].get(image.format, 0) + 1
+            except Exception as e:
+                logger.debug(f"无法读取 {img_path} 的头部：{str(e)}")
+                stats["failed"] += 1
+    return stats
 
-        if res[0] != ErrorCode.Success:
-            logger.warning(f"序列 {i} 处理失败，跳过清理")
-            yield res[0], progress
-            continue
 
-        # 清理原文件
-        cleanup_res = cleanup_original_files(seq_info, send_to_trash, res[1])
-        if cleanup_res != ErrorCode.Success:
-            logger.warning(f"序列 {i} 清理失败: {cleanup_res.generic}")
+def _calibrate(sequences: List[SequenceInfo], total_pages: int, settings: dict,
+               sample_size: int) -> tuple[float, float, int]:
+    """
+    从所有页面中均匀抽取样本，按实际设置在内存中转换，测量每页耗时和输出与输入的字节比例，不写入任何文件。
+
+    :param sequences: 序列列表
+    :param total_pages: 总页数
+    :param settings: run_settings 返回的设置
+    :param sample_size: 样本页数
+    :return: 元组，依次为每页秒数、输出与输入的字节比例和实际使用的样本数
+    """
+    step = max(1, total_pages // max(1, sample_size))
+    picks = set(range(step // 2, total_pages, step))
+    pdf_document = fitz.open()
+    archive_buffer = io.BytesIO()
+    input_bytes = 0
+    sampled = 0
+    offset = 0
+    start = time.perf_counter()
+    with zipfile.ZipFile(archive_buffer, "w", compression=zipfile.ZIP_STORED) as cbz:
+        for sequence_info in sequences:
+            chosen = [i - offset for i in range(offset, offset + len(sequence_info["sequence"])) if i in picks]
+            offset += len(sequence_info["sequence"])
+            if not chosen:
+                continue
+            with _open_archive(sequence_info) as archive:
+                for index in chosen:
+                    img_path = sequence_info["sequence"][index]
+                    try:
+                        input_bytes += _source_size(img_path, archive)
+                        if settings["output_format"] == "cbz":
+                            with _open_source(img_path, archive) as source:
+                                cbz.writestr(f"{sampled}{os.path.splitext(img_path)[1]}", source.read())
+                        else:
+                            _insert_page(pdf_document, _prepare_page(img_path, settings["options"], archive))
+                        sampled += 1
+                    except Exception as e:
+                        logger.debug(f"无法转换样本 {img_path}：{str(e)}")
+    if settings["output_format"] == "cbz":
+        output_bytes = archive_buffer.tell()
+    else:
+        output_bytes = len(pdf_document.tobytes(garbage=settings["garbage"], deflate=settings["deflate"])) \
+            if sampled else 0
+    pdf_document.close()
+    elapsed = time.perf_counter() - start
+    if not sampled:
+        return 0.0, 1.0, 0
+    return elapsed / sampled, output_bytes / input_bytes if input_bytes else 1.0, sampled
+
 
-        yield ErrorCode.Success, progress
+def plan_image_sequences(target_folder: str, recursive: bool = False, archives: bool = False,
+                         settings: dict | None = None, workers: int = 1,
+                         sample_size: int = CALIBRATION_PAGES) -> tuple[ErrorCode, dict]:
+    """
+    预估转换的规模和耗时，不写入任何文件。
 
+    查找序列后只读取每个图像的头部统计页数和大小，再按实际设置转换少量样本页，
+    由样本的每页耗时和输出比例推算全部序列的输出大小和耗时。返回的计划可以用 save_plan 保存，之后用 execute_plan 执行，
+    执行时不再重新查找序列。
+    :param target_folder: 目标文件夹
+    :param recursive: 是否递归查找
+    :param archives: 是否将 ZIP/CBZ 压缩包当作文件夹查找
+    :param settings: run_settings 返回的设置，为 None 时使用默认设置
+    :param workers: 计划使用的进程数，用于推算耗时
+    :param sample_size: 样本页数
+    :return: 元组，第一项是错误码，第二项是计划
+    """
+    settings = settings or run_settings()
+    if settings["output_format"] not in OUTPUT_FORMATS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的输出格式 {settings['output_format']}"))
+        return ErrorCode.InvalidArgument, {}
+    error_code, sequences = find_image_sequences(target_folder, recursive, archives)
+    if error_code != ErrorCode.Success:
+        return error_code, {}
+
+    # 读取头部的耗时主要在 IO 上，多个序列同时读取
+    with ThreadPoolExecutor(max_workers=PROBE_THREADS) as executor:
+        probes = list(executor.map(_probe_sequence, sequences))
+    total_pages = sum(probe["pages"] for probe in probes)
+    input_bytes = sum(probe["input_bytes"] for probe in probes)
+    formats: Dict[str, int] = defaultdict(int)
+    for probe in probes:
+        for image_format, count in probe["formats"].items():
+            formats[image_format] += count
+
+    seconds_per_page, ratio, sampled = _calibrate(sequences, total_pages, settings, sample_size)
+    estimate = {
+        "sequences": len(sequences),
+        "pages": total_pages,
+        "input_bytes": input_bytes,
+        "pixels": sum(probe["pixels"] for probe in probes),
+        "formats": dict(formats),
+        "failed_probes": sum(probe["failed"] for probe in probes),
+        "sample_pages": sampled,
+        "output_bytes": int(input_bytes * ratio),
+        "seconds": total_pages * seconds_per_page / max(1, min(workers, len(sequences))),
+        "workers": workers
+    }
+    logger.info(f"预估完成：{len(sequences)} 个序列，{total_pages} 页，输出约 {estimate['output_bytes']} 字节，"
+                f"耗时约 {estimate['seconds']:.1f} 秒")
+    plan = {"version": PLAN_VERSION, "target_folder": target_folder, "recursive": recursive, "archives": archives,
+            "settings": settings, "sequences": sequences, "estimate": estimate}
+    return ErrorCode.Success, plan
+
+
+def format_plan(plan: dict) -> str:
+    """
+    将计划的预估结果整理为文本。
+
+    :param plan: plan_image_sequences 返回的计划
+    :return: 报告文本
+    """
+    estimate = plan["estimate"]
+    formats = "，".join(f"{image_format} {count}" for image_format, count in estimate["formats"].items())
+    lines = [f"序列：{estimate['sequences']} 个，共 {estimate['pages']} 页（{formats or '无'}）",
+             f"输入：{estimate['input_bytes'] / 1024 ** 2:.1f} MB，{estimate['pixels'] / 1e6:.1f} 百万像素",
+             f"预计输出：{estimate['output_bytes'] / 1024 ** 2:.1f} MB（{plan['settings']['output_format'].upper()}）",
+             f"预计耗时：{estimate['seconds']:.1f} 秒（{estimate['workers']} 个进程，样本 {estimate['sample_pages']} 页）"]
+    if estimate["failed_probes"]:
+        lines.append(f"无法读取：{estimate['failed_probes']} 个图像")
+    return "\n".join(lines)
+
+
+def save_plan(plan: dict, path: str) -> ErrorCode:
+    """
+    将计划保存为 JSON 文件。
+
+    :param plan: plan_image_sequences 返回的计划
+    :param path: 保存路径
+    :return: 错误码
+    """
+    return utils.atomic_write(path, json.dumps(plan, ensure_ascii=False).encode("utf-8"))
+
+
+def load_plan(path: str) -> tuple[ErrorCode, dict]:
+    """
+    读取 save_plan 保存的计划。
+
+    :param path: 计划文件路径
+    :return: 元组，第一项是错误码，文件无法读取时为 CannotReadFile，版本不同时为 InvalidArgument，第二项是计划
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            plan = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(ErrorCode.CannotReadFile.format(f"{path}，{str(e)}"))
+        return ErrorCode.CannotReadFile, {}
+    if not isinstance(plan, dict) or plan.get("version") != PLAN_VERSION:
+        logger.error(ErrorCode.InvalidArgument.format(f"不支持的计划版本：{path}"))
+        return ErrorCode.InvalidArgument, {}
+    return ErrorCode.Success, plan
+
+
+def _refresh_sequences(sequences: List[SequenceInfo]) -> List[SequenceInfo]:
+    """
+    执行计划前重新读取序列所在文件夹的内容，不会递归查找。
+
+    计划中已不存在的文件被移除，之后新增的文件不会加入序列。文件夹内容以当前为准，
+    避免文件夹在计划保存后新增了其他文件时，清理仍按旧的内容将整个文件夹移至回收站。
+    :param sequences: 计划中的序列
+    :return: 更新后的序列，所有文件都已不存在的序列被移除
+    """
+    listings: Dict[str, tuple[List[str], bool]] = {}
+    refreshed = []
+    for sequence_info in sequences:
+        folder = sequence_info["folder"]
+        if folder not in listings:
+            try:
+                if sequence_info["archive"]:
+                    found = {seq["folder"]: seq for seq in _scan_archive(sequence_info["archive"])}
+                    listings.update({key: (seq["all_files"], seq["has_subfolder"]) for key, seq in found.items()})
+                    listings.setdefault(folder, ([], False))
+                else:
+                    dirnames, filenames, _ = _list_folder(folder)
+                    listings[folder] = ([os.path.join(folder, f) for f in filenames] +
+                                        [os.path.join(folder, d) for d in dirnames], bool(dirnames))
+            except (OSError, zipfile.BadZipFile) as e:
+                logger.warning(f"无法读取 {folder}：{str(e)}")
+                listings[folder] = ([], False)
+        all_files, has_subfolder = listings[folder]
+        present = set(all_files)
+        paths = [path for path in sequence_info["sequence"] if path in present]
+        if len(paths) < len(sequence_info["sequence"]):
+            logger.warning(f"{folder} 中有 {len(sequence_info['sequence']) - len(paths)} 个文件已不存在")
+        if paths:
+            refreshed.append(SequenceInfo(folder=folder, sequence=paths, all_files=all_files,
+                                          has_subfolder=has_subfolder, archive=sequence_info["archive"]))
+    return refreshed
+
+
+def execute_plan(plan: dict, send_to_trash: bool = False, workers: int = 1,
+                 page_workers: int = 1) -> Generator[tuple[ErrorCode, int], None, None]:
+    """
+    按计划中的序列和设置生成输出，不再重新查找序列，其余行为与 process_image_sequences 相同。
+
+    :param plan: plan_image_sequences 返回或 load_plan 读取的计划
+    :param send_to_trash: 是否将原文件移至回收站
+    :param workers: 进程数
+    :param page_workers: 准备页面的线程总数
+    :return: 包含状态码和进度的生成器
+    """
+    settings = plan["settings"]
+    if settings["output_format"] not in OUTPUT_FORMATS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的输出格式 {settings['output_format']}"))
+        yield ErrorCode.InvalidArgument, 0
+        return None
+    sequences = _refresh_sequences(plan["sequences"])
+    logger.info(f"按计划处理 {len(sequences)} 个序列")
+    yield from _run_sequences(sequences, settings, send_to_trash, workers, page_workers)
     return None
@@ -1,6 +1,16 @@
-import glob
+import hashlib
+import io
+import json
 import os
-from typing import Generator
+import queue
+import struct
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import closing
+from itertools import islice
+from typing import Generator, Iterable, TypedDict
 
 from PIL import Image, UnidentifiedImageError
 
@@ -10,49 +20,946 @@ from modules.utils import utils
 
 logger = log_manager.get_logger(__name__)
 
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# 探测透明通道时使用的线程数，探测主要耗时在文件读取上，所以线程数可以比核心数多
+PROBE_THREADS = 16
+# 流式转换时，查找线程与转换之间的队列长度
+STREAM_QUEUE_SIZE = 256
+# 增量转换清单的文件名，以 . 开头，查找图像时会被跳过
+MANIFEST_NAME = ".png2jpg_manifest.jsonl"
+MANIFEST_VERSION = 2
+# 任务日志的文件名，每行一条 JSON 记录，任务正常完成后会被删除
+JOURNAL_NAME = ".png2jpg_journal.jsonl"
+JOURNAL_VERSION = 2
+# 目标大小模式下，二分查找质量时最多尝试的次数，7次足以覆盖 1-100 的所有质量
+MAX_SIZE_PROBES = 7
+# 转换时解码后的图像和 convert 得到的副本通常同时存在，估算内存占用时按两份计算
+DECODE_COPIES = 2
+# PNG2JPGWorker 默认使用的内存预算
+MEMORY_BUDGET = 4 * 1024 ** 3
+# 限制尺寸时可选的重采样方式
+RESAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS
+}
+# thumbnail 的 reducing_gap，先用 draft/reduce 快速缩小到目标尺寸的这个倍数，再进行重采样
+REDUCING_GAP = 3.0
+# 计算内容哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024
+# PNG2JPGWorker 默认使用的写入线程数
+WRITER_THREADS = 4
 
-def convert_single(input_path: str, quality: int, preserve_metadata: bool, deduplicate: int,
-                   old: str = "png") -> tuple[ErrorCode, str]:
+
+class Encoder(TypedDict):
+    """输出编码器，params 会在保存时传递给 Image.save"""
+    label: str
+    format: str
+    extension: str
+    supports_alpha: bool
+    params: dict
+
+
+# 可用的输出编码器，键会保存在增量转换清单中，修改已有编码器的参数时应使用新的键
+ENCODERS: dict[str, Encoder] = {
+    "jpeg": Encoder(label="JPEG", format="JPEG", extension="jpg", supports_alpha=False, params={}),
+    "jpeg_optimized": Encoder(label="JPEG（优化霍夫曼表）", format="JPEG", extension="jpg", supports_alpha=False,
+                              params={"optimize": True}),
+    "jpeg_progressive": Encoder(label="JPEG（渐进式）", format="JPEG", extension="jpg", supports_alpha=False,
+                                params={"optimize": True, "progressive": True}),
+    "webp": Encoder(label="WebP", format="WEBP", extension="webp", supports_alpha=True, params={"method": 4}),
+    "webp_lossless": Encoder(label="WebP（无损）", format="WEBP", extension="webp", supports_alpha=True,
+                             params={"lossless": True, "method": 4})
+}
+
+
+def register_encoder(key: str, label: str, image_format: str, extension: str, supports_alpha: bool = False,
+                     **params) -> ErrorCode:
+    """
+    注册输出编码器
+
+    进程池的子进程会重新导入模块，多进程转换时需要在模块导入阶段注册，否则子进程中找不到该编码器
+
+    :param key: 编码器的键
+    :param label: 显示名称
+    :param image_format: Pillow 的格式名称，需要本地的 Pillow 支持保存
+    :param extension: 输出文件的扩展名，不含 .
+    :param supports_alpha: 是否支持透明通道，不支持时会先转换为 RGB
+    :param params: 传递给 Image.save 的其他参数
+    :return: 错误码，本地的 Pillow 无法保存该格式时为 InvalidArgument
+    """
+    Image.init()
+    if image_format.upper() not in Image.SAVE:
+        logger.error(ErrorCode.InvalidArgument.format(f"本地的 Pillow 不支持保存 {image_format} 格式"))
+        return ErrorCode.InvalidArgument
+    ENCODERS[key] = Encoder(label=label, format=image_format.upper(), extension=extension.lstrip("."),
+                            supports_alpha=supports_alpha, params=params)
+    logger.debug(f"已注册编码器 {key}：{ENCODERS[key]}")
+    return ErrorCode.Success
+
+
+def is_lossless(encoder: str) -> bool:
+    """
+    无损编码器的 quality 表示压缩力度而不是画质，输出大小不会随之明显减小，无法按目标大小编码
+
+    :param encoder: 输出编码器，见 ENCODERS
+    :return: 是否为无损编码器
     """
-    转换单个图像文件
+    return encoder in ENCODERS and bool(ENCODERS[encoder]["params"].get("lossless"))
+
+
+class StreamProgress(TypedDict):
+    """流式转换中单个文件的处理结果和当前进度"""
+    source: str
+    output: str
+    converted: int
+    discovered: int
+    discovery_done: bool
+    saved_seconds: float
+
+
+class ConvertManifest:
+    """
+    增量转换清单，记录每个源文件的大小、修改时间和输出路径，编码设置只在第一行记录一次
+
+    源文件和编码设置都没有变化且输出文件仍然存在时，可以直接跳过而不需要打开图像。
+    路径以相对于清单所在文件夹的形式保存，移动整个文件夹后清单仍然有效。
+    与任务日志相同，清单按行追加写入，每次转换成功只追加一行；同一文件的记录以最后一行为准，
+    过期的记录过多时会在下次写入前压缩。编码设置改变时旧的记录全部失效，清单会被重新生成
+    """
+    FLUSH_INTERVAL = 500
+
+    def __init__(self, folder: str, settings: dict):
+        """
+        :param folder: 清单所在的文件夹
+        :param settings: 本次转换的编码设置，与清单中的设置不同时所有源文件都会被重新转换
+        """
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.settings = settings
+        self.entries: dict[str, dict] = {}
+        # 已有清单中的记录行数，可以直接追加时为 0 以上，需要重新生成时为 None
+        self._lines: int | None = None
+        self._file = None
+        self._unflushed = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("version") != MANIFEST_VERSION or header.get("settings") != self.settings:
+                    logger.info(f"转换清单的版本或编码设置不同，将重新生成：{self.path}")
+                    return
+                lines = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.debug(f"忽略无法解析的清单记录：{line!r}")
+                        continue
+                    self.entries[record.pop("file")] = record
+                    lines += 1
+            self._lines = lines
+            logger.info(f"已读取转换清单 {self.path}，共 {len(self.entries)} 项")
+        except Exception as e:
+            self.entries = {}
+            logger.warning(f"无法读取转换清单，将重新生成：{str(e)}")
+
+    def _open(self):
+        """打开清单以追加记录，清单不存在、需要重新生成或过期的记录超过一半时先重写"""
+        if self._lines is None or self._lines > 2 * len(self.entries):
+            lines = [{"version": MANIFEST_VERSION, "settings": self.settings}]
+            lines.extend({"file": key, **entry} for key, entry in self.entries.items())
+            data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+            if utils.atomic_write(self.path, data) != ErrorCode.Success:
+                raise OSError(f"无法创建转换清单 {self.path}")
+            self._lines = len(self.entries)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def save(self):
+        """将追加的记录写入磁盘并关闭清单"""
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            logger.debug(f"已保存转换清单：{self.path}")
+        except OSError as e:
+            logger.error(ErrorCode.CannotWriteFile.format(f"{self.path}，{str(e)}"))
+        self._file = None
+        self._unflushed = 0
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.folder).replace(os.sep, "/")
+
+    def lookup(self, source: str) -> str | None:
+        """
+        :param source: 源文件路径
+        :return: 源文件没有变化时返回之前的输出路径，否则返回 None
+        """
+        entry = self.entries.get(self._key(source))
+        if not entry:
+            return None
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return None
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            return None
+        output = os.path.normpath(os.path.join(self.folder, entry["output"]))
+        return output if os.path.exists(output) else None
+
+    def record(self, source: str, output: str):
+        """
+        :param source: 源文件路径
+        :param output: 转换后的文件路径
+        """
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return
+        key = self._key(source)
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "output": self._key(output)}
+        try:
+            if self._file is None:
+                self._open()
+            self.entries[key] = entry
+            self._file.write(json.dumps({"file": key, **entry}, ensure_ascii=False) + "\n")
+            self._lines += 1
+            self._unflushed += 1
+            if self._unflushed >= self.FLUSH_INTERVAL:
+                self._file.flush()
+                self._unflushed = 0
+        except OSError as e:
+            logger.error(ErrorCode.CannotWriteFile.format(f"{self.path}，{str(e)}"))
+
+
+class ConvertJournal:
+    """
+    任务日志，记录本次任务中已完成、已跳过和失败的文件，以及已经全部处理完的文件夹
+
+    日志按行追加写入：第一行为版本和设置，之后每行记录一个文件的状态或一个已处理完的文件夹，
+    每条记录只写入一次，写入量与文件数量成正比。追加的记录定期刷新到磁盘，
+    任务被终止或程序崩溃后可以从上次刷新的位置继续：已处理的文件不会再次转换，已处理完的子树不会再次扫描。
+    继续任务时会先把读取到的状态压缩后重写为新的日志。任务正常完成后日志会被删除。
+
+    查找线程和转换步骤会同时访问日志，所有方法都持有同一个锁
+    """
+    FLUSH_INTERVAL = 200
+    FLUSH_SECONDS = 10.0
+
+    def __init__(self, folder: str, settings: dict, resume: bool = False):
+        """
+        :param folder: 任务的根文件夹，日志保存在其中
+        :param settings: 任务设置，继续任务时与日志中的设置不同则重新开始
+        :param resume: 是否读取已有的日志继续任务，为 False 时覆盖旧日志
+        """
+        self.folder = folder
+        self.path = os.path.join(folder, JOURNAL_NAME)
+        self.settings = settings
+        # 文件状态：completed、skipped 或 failed
+        self.items: dict[str, str] = {}
+        # 整个子树都已处理完的文件夹，子文件夹被父文件夹包含后会被移除
+        self.finished: set[str] = set()
+        # 本次扫描过且尚未处理完的文件夹：[PNG文件数, 已处理数, 子文件夹]
+        self.dirs: dict[str, list] = {}
+        self.resumed = 0
+        self._file = None
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        if resume:
+            self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            logger.info("没有可以继续的任务")
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline() or "{}")
+                if header.get("version") != JOURNAL_VERSION or header.get("settings") != self.settings:
+                    logger.warning(f"任务设置已改变，将重新开始：{self.path}")
+                    return
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 程序崩溃时最后一行可能只写了一半
+                        logger.debug(f"忽略无法解析的日志记录：{line!r}")
+                        continue
+                    if "dir" in record:
+                        self.finished.add(record["dir"])
+                    else:
+                        self.items[record["file"]] = record["status"]
+            # 已处理完的文件夹包含的文件和子文件夹不需要再单独记录
+            self.finished = {key for key in self.finished if key == "." or not self._in_finished(self._parent(key))}
+            self.items = {key: status for key, status in self.items.items()
+                          if not self._in_finished(self._parent(key))}
+            logger.info(f"继续任务 {self.path}，已处理 {len(self.items)} 项文件和 {len(self.finished)} 个文件夹")
+        except Exception as e:
+            self.items, self.finished = {}, set()
+            logger.warning(f"无法读取任务日志，将重新开始：{str(e)}")
+
+    def _key(self, path: str) -> str:
+        return os.path.relpath(path, self.folder).replace(os.sep, "/")
+
+    @staticmethod
+    def _parent(key: str) -> str:
+        return key.rpartition("/")[0] or "."
+
+    def _in_finished(self, key: str) -> bool:
+        while key not in self.finished:
+            if key == ".":
+                return False
+            key = self._parent(key)
+        return True
+
+    def _subtree_done(self, key: str, done: dict[str, bool]) -> bool:
+        if key in self.finished:
+            return True
+        if key not in done:
+            state = self.dirs.get(key)
+            done[key] = state is not None and state[1] >= state[0] and \
+                all(self._subtree_done(sub, done) for sub in state[2])
+        return done[key]
+
+    def _collapse(self) -> list[str]:
+        """
+        将已处理完的文件夹合并到 finished 中，并移除其中的文件记录，使内存占用只与未完成的部分有关
+
+        :return: 新处理完的文件夹
+        """
+        done = {}
+        newly_done = [key for key in self.dirs if self._subtree_done(key, done)]
+        self.finished.update(newly_done)
+        for key in newly_done:
+            self.finished.difference_update(self.dirs.pop(key)[2])
+        if newly_done:
+            done_set = set(newly_done)
+            self.items = {key: status for key, status in self.items.items() if self._parent(key) not in done_set}
+        return newly_done
+
+    def _write(self, record: dict):
+        if self._file is None:
+            self._open()
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._unflushed += 1
+
+    def _open(self):
+        """创建新的日志，写入设置和从旧日志读取到的状态，之后的记录追加到其后"""
+        lines = [{"version": JOURNAL_VERSION, "settings": self.settings}]
+        lines.extend({"dir": key} for key in sorted(self.finished))
+        lines.extend({"file": key, "status": status} for key, status in self.items.items())
+        data = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+        if utils.atomic_write(self.path, data) != ErrorCode.Success:
+            raise OSError(f"无法创建任务日志 {self.path}")
+        self._file = open(self.path, "a", encoding="utf-8")
+        logger.debug(f"已创建任务日志：{self.path}")
+
+    def _flush(self):
+        for key in self._collapse():
+            self._write({"dir": key})
+        if self._file is not None:
+            self._file.flush()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def skip_directory(self, path: str) -> bool:
+        """
+        :param path: 文件夹路径
+        :return: 整个子树是否已在之前处理完
+        """
+        with self._lock:
+            return self._key(path) in self.finished
+
+    def directory_listed(self, path: str, files: list[str], subdirs: list[str]) -> tuple[list[str], list[str]]:
+        """
+        记录扫描到的文件夹内容
+
+        :param path: 文件夹路径
+        :param files: 文件夹中的PNG文件
+        :param subdirs: 文件夹中的子文件夹
+        :return: 元组，第一项为尚未处理的文件，第二项为尚未处理完的子文件夹
+        """
+        with self._lock:
+            pending_files = [file for file in files if self._key(file) not in self.items]
+            pending_dirs = [sub for sub in subdirs if self._key(sub) not in self.finished]
+            self.resumed += len(files) - len(pending_files)
+            self.dirs[self._key(path)] = [len(files), len(files) - len(pending_files),
+                                          [self._key(sub) for sub in subdirs]]
+            return pending_files, pending_dirs
+
+    def is_resolved(self, path: str) -> bool:
+        """
+        :param path: 文件路径
+        :return: 文件是否已在之前处理过
+        """
+        with self._lock:
+            key = self._key(path)
+            return key in self.items or self._in_finished(self._parent(key))
+
+    def resolve(self, path: str, err: ErrorCode):
+        """
+        记录文件的处理结果，追加到日志中，达到刷新间隔时写入磁盘
+
+        :param path: 文件路径
+        :param err: 处理结果，Success 记为 completed，FileSkipped 记为 skipped，其他记为 failed
+        """
+        status = "completed" if err == ErrorCode.Success else "skipped" if err == ErrorCode.FileSkipped else "failed"
+        with self._lock:
+            key = self._key(path)
+            if key not in self.items:
+                state = self.dirs.get(self._parent(key))
+                if state is not None:
+                    state[1] += 1
+            self.items[key] = status
+            try:
+                self._write({"file": key, "status": status})
+                if self._unflushed >= self.FLUSH_INTERVAL or \
+                        time.monotonic() - self._last_flush >= self.FLUSH_SECONDS:
+                    self._flush()
+            except OSError as e:
+                logger.error(ErrorCode.CannotWriteFile.format(f"{self.path}，{str(e)}"))
+
+    def save(self):
+        """将尚未刷新的记录写入磁盘并关闭日志，任务被终止或出错时调用"""
+        with self._lock:
+            try:
+                if self._file is None:
+                    self._open()
+                self._flush()
+                logger.debug(f"已保存任务日志：{self.path}")
+            except OSError as e:
+                logger.error(ErrorCode.CannotWriteFile.format(f"{self.path}，{str(e)}"))
+            finally:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+
+    def discard(self):
+        """任务正常完成后删除日志"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        try:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+                logger.debug(f"已删除任务日志：{self.path}")
+        except OSError as e:
+            logger.warning(ErrorCode.CannotDelTempFile.format(f"{self.path}，{str(e)}"))
+
+
+def encode_options(quality: int, preserve_metadata: bool, target_size: int = 0, max_dimension: int = 0,
+                   resample: str = "lanczos", encoder: str = "jpeg") -> dict:
+    """
+    汇总会影响输出文件内容的编码设置，既作为 convert_single 的参数，也用于增量转换清单的比较
+
+    :param quality: 质量，目标大小模式下为质量上限
+    :param preserve_metadata: 保留元数据
+    :param target_size: 目标文件大小（字节），0 为使用固定质量，无损编码器会忽略此项
+    :param max_dimension: 输出图像的最大边长（像素），0 为不限制
+    :param resample: 缩小图像时的重采样方式，见 RESAMPLE_FILTERS
+    :param encoder: 输出编码器，见 ENCODERS
+    :return: 设置字典
+    """
+    if target_size > 0 and is_lossless(encoder):
+        logger.warning(f"无损编码器 {encoder} 无法按目标大小编码，已忽略目标大小 {target_size} 字节")
+        target_size = 0
+    return {"quality": quality, "preserve_metadata": preserve_metadata, "target_size": target_size,
+            "max_dimension": max_dimension, "resample": resample, "encoder": encoder}
+
+
+def _encode_to_size(image: Image.Image, max_quality: int, target_size: int, save_kwargs: dict,
+                    image_format: str = "JPEG") -> tuple[bytes, int]:
+    """
+    在内存中编码图像，二分查找不超过目标大小的最高质量，所有尝试共用同一个已解码的图像
+
+    :param image: 已打开的图像
+    :param max_quality: 质量上限
+    :param target_size: 目标文件大小（字节）
+    :param save_kwargs: 传递给 Image.save 的其他参数
+    :param image_format: 输出格式
+    :return: 元组，第一项为编码后的数据，第二项为使用的质量。所有质量都超过目标大小时返回尝试过的最小结果
+    """
+    def encode(q: int) -> bytes:
+        buffer = io.BytesIO()
+        image.save(buffer, image_format, quality=q, **save_kwargs)
+        return buffer.getvalue()
+
+    data = encode(max_quality)
+    if len(data) <= target_size:
+        return data, max_quality
+    fitted = None
+    smallest = data, max_quality
+    low, high = 1, max_quality - 1
+    for _ in range(MAX_SIZE_PROBES):
+        if low > high:
+            break
+        quality = (low + high) // 2
+        data = encode(quality)
+        logger.debug(f"质量 {quality}：{len(data)} 字节")
+        if len(data) <= target_size:
+            fitted = data, quality
+            low = quality + 1
+        else:
+            smallest = data, quality
+            high = quality - 1
+    if fitted is None:
+        logger.warning(f"最低质量 {smallest[1]} 仍超过目标大小 {target_size} 字节，实际大小：{len(smallest[0])} 字节")
+        return smallest
+    return fitted
+
+
+def get_output_path(input_path: str, deduplicate: int, old: str = "png",
+                    extension: str = "jpg", taken: set[str] | None = None) -> tuple[ErrorCode, str]:
+    """
+    构建转换后的输出路径
 
     :param input_path: 图像路径
-    :param quality: 质量
+    :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param old: 旧文件的扩展名
+    :param extension: 新文件的扩展名
+    :param taken: 已分配给其他正在转换的图像、尚未写入的输出路径，保留两者模式下会避开
+    :return: 包含错误码和新文件路径的元组，错误码为 Success 或 FileSkipped
+    """
+    output_path = utils.remove_substring(input_path, old, "suffix") + extension
+    if not output_path.endswith(f".{extension}"):
+        output_path = f"{output_path}.{extension}"
+    return utils.filename_deduplicate(deduplicate, output_path, taken)
+
+
+def encode_single(input_path: str, quality: int, preserve_metadata: bool, deduplicate: int,
+                  old: str = "png", target_size: int = 0, max_dimension: int = 0,
+                  resample: str = "lanczos", encoder: str = "jpeg",
+                  output_path: str = "") -> tuple[ErrorCode, str, bytes]:
+    """
+    转换单个图像文件，只编码到内存中，不写入磁盘
+
+    :param input_path: 图像路径
+    :param quality: 质量，目标大小模式下为质量上限
     :param preserve_metadata: 保留元数据
     :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
     :param old: 旧文件的扩展名，因为它不只能转PNG，也可以转别的，此处留下这个接口以便其他脚本调用
-    :return: 包含错误码和新文件路径的元组
+    :param target_size: 目标文件大小（字节），大于0时在内存中查找不超过此大小的最高质量，只写入一次磁盘，无损编码器会忽略此项
+    :param max_dimension: 最大边长（像素），大于0时按比例缩小超出的图像，JPEG等格式会在解码时直接缩小
+    :param resample: 缩小图像时的重采样方式，见 RESAMPLE_FILTERS
+    :param encoder: 输出编码器，见 ENCODERS
+    :param output_path: 调用方预先分配的输出路径，提供时不再按 deduplicate 构建
+    :return: 包含错误码、新文件路径和编码后数据的元组，出错或跳过时数据为空
     """
     logger.debug(f"正在转换：{input_path}")
+    if encoder not in ENCODERS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的编码器 {encoder}"))
+        return ErrorCode.InvalidArgument, input_path, b""
+    output_encoder = ENCODERS[encoder]
     with Image.open(input_path) as image:
         logger.debug(f"图像模式：{image.mode}")
-        if 'A' in image.mode:
+        # 在加载图像前缩小，thumbnail 会先尝试 draft 和 reduce，避免完整解码和全尺寸重采样
+        if 0 < max_dimension < max(image.size):
+            if image.mode in ("1", "P"):
+                # 这两种模式缩放时只能使用最近邻，调色板中的透明度在编码器支持时保留
+                image = image.convert("RGBA" if image.has_transparency_data and output_encoder["supports_alpha"]
+                                      else "RGB")
+            image.thumbnail((max_dimension, max_dimension), resample=RESAMPLE_FILTERS[resample],
+                            reducing_gap=REDUCING_GAP)
+            logger.debug(f"缩小后的尺寸：{image.size}")
+        if 'A' in image.mode and not output_encoder["supports_alpha"]:
             image = image.convert('RGB')
 
         # 新图像路径
-        output_path = utils.remove_substring(input_path, old, "suffix") + "jpg"
-        if not output_path.endswith(".jpg"):
-            output_path = output_path + ".jpg"
-        dedup_res = utils.filename_deduplicate(deduplicate, output_path)
-        if dedup_res[0] != ErrorCode.Success:
-            logger.error(dedup_res[0].format(input_path))
-            return dedup_res
-        else:
+        if not output_path:
+            dedup_res = get_output_path(input_path, deduplicate, old, output_encoder["extension"])
+            if dedup_res[0] != ErrorCode.Success:
+                logger.error(dedup_res[0].format(input_path))
+                return *dedup_res, b""
             output_path = dedup_res[1]
-            logger.debug(f"构建的输出图像路径：{output_path}")
+        logger.debug(f"构建的输出图像路径：{output_path}")
 
         # 转换
+        save_kwargs = dict(output_encoder["params"])
         if preserve_metadata:
-            image.save(output_path, 'JPEG', quality=quality, metadata=image.info)
+            save_kwargs["metadata"] = image.info
+        if target_size > 0 and not is_lossless(encoder):
+            data, used_quality = _encode_to_size(image, quality, target_size, save_kwargs, output_encoder["format"])
+            logger.info(f"已编码 {output_path}，质量：{used_quality}，大小：{len(data)} 字节")
         else:
-            image.save(output_path, 'JPEG', quality=quality)
+            buffer = io.BytesIO()
+            image.save(buffer, output_encoder["format"], quality=quality, **save_kwargs)
+            data = buffer.getvalue()
+            logger.debug(f"已编码 {output_path}，大小：{len(data)} 字节")
+        return ErrorCode.Success, output_path, data
+
+
+def convert_single(input_path: str, quality: int, preserve_metadata: bool, deduplicate: int,
+                   old: str = "png", target_size: int = 0, max_dimension: int = 0,
+                   resample: str = "lanczos", encoder: str = "jpeg") -> tuple[ErrorCode, str]:
+    """
+    转换单个图像文件，参数见 encode_single，编码后的数据通过临时文件和重命名原子地写入
+
+    :return: 包含错误码和新文件路径的元组
+    """
+    err, output_path, data = encode_single(input_path, quality, preserve_metadata, deduplicate, old,
+                                           target_size, max_dimension, resample, encoder)
+    if err != ErrorCode.Success:
+        return err, output_path
+    write_res = utils.atomic_write(output_path, data)
+    if write_res != ErrorCode.Success:
+        return write_res, input_path
+    logger.info(f"已转换 {output_path}")
+    return ErrorCode.Success, output_path
+
+
+def _encode_task(input_path: str, deduplicate: int, options: dict,
+                 output_path: str = "") -> tuple[ErrorCode, str, float, bytes]:
+    """
+    单项编码任务，也会被进程池调用，异常会被转换为错误码，避免在进程间传递异常对象
+
+    :param input_path: 图像路径
+    :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param options: encode_options 返回的编码设置
+    :param output_path: 预先分配的输出路径，见 encode_single
+    :return: 包含错误码、新文件路径、编码耗时（秒）和编码后数据的元组，出错时第二项为输入路径
+    """
+    logger.info(f"正在转换：{input_path}")
+    if not os.path.exists(input_path):
+        logger.error(ErrorCode.InvalidPath.format(input_path))
+        return ErrorCode.InvalidPath, input_path, 0.0, b""
+    start = time.perf_counter()
+    try:
+        err, output_path, data = encode_single(input_path=input_path, deduplicate=deduplicate,
+                                               output_path=output_path, **options)
+        return err, output_path, time.perf_counter() - start, data
+    except UnidentifiedImageError:
+        logger.error(ErrorCode.BrokenImage.format(input_path))
+        return ErrorCode.BrokenImage, input_path, time.perf_counter() - start, b""
+    except Exception as e:
+        logger.error(f"转换失败：{str(e)}")
+        return ErrorCode.Unknown, input_path, time.perf_counter() - start, b""
+
+
+def _write_result(input_path: str, res: tuple[ErrorCode, str, float, bytes]) -> tuple[ErrorCode, str, float]:
+    """
+    写入 _encode_task 的结果，写入线程和单项转换任务共用
+
+    :param input_path: 图像路径
+    :param res: _encode_task 的返回值
+    :return: 包含错误码、新文件路径和转换耗时（秒）的元组，耗时包含写入时间，出错时第二项为输入路径
+    """
+    err, output_path, seconds, data = res
+    if err != ErrorCode.Success:
+        return err, output_path, seconds
+    start = time.perf_counter()
+    write_res = utils.atomic_write(output_path, data)
+    seconds += time.perf_counter() - start
+    if write_res != ErrorCode.Success:
+        return write_res, input_path, seconds
+    logger.info(f"已转换 {output_path}")
+    return ErrorCode.Success, output_path, seconds
+
+
+def _convert_task(input_path: str, deduplicate: int, options: dict,
+                  output_path: str = "") -> tuple[ErrorCode, str, float]:
+    """
+    单项转换任务，编码后直接在当前进程中写入
 
-        logger.info(f"已转换 {output_path}")
-        return ErrorCode.Success, output_path
+    :param input_path: 图像路径
+    :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param options: encode_options 返回的编码设置
+    :param output_path: 预先分配的输出路径，见 encode_single
+    :return: 包含错误码、新文件路径和转换耗时（秒）的元组，出错时第二项为输入路径
+    """
+    return _write_result(input_path, _encode_task(input_path, deduplicate, options, output_path))
+
+
+class ContentDedup:
+    """
+    按内容去重，内容相同的源文件只转换一次，其余的复用第一次转换的结果
 
+    只有大小与之前某个文件相同的源文件才需要计算哈希，大小唯一的文件不会被额外读取。
+    重复文件的输出通过 utils.link_or_copy 创建，根据文件系统选择 reflink、硬链接或复制
 
-def convert_batch(images: list, quality: int, preserve_metadata: bool,
-                  deduplicate: int) -> Generator[tuple[ErrorCode, int], None, tuple[ErrorCode, int]]:
+    原文件损坏或转换出错时，重复文件得到相同的错误码；原文件被跳过或写入失败时，这份内容在本次任务中没有输出，
+    第一个重复文件会代替它重新转换
+    """
+    # 由图像内容决定、重复文件也会得到的错误码
+    SHARED_ERRORS = (ErrorCode.BrokenImage, ErrorCode.Unknown)
+
+    def __init__(self, deduplicate: int, old: str = "png", extension: str = "jpg"):
+        """
+        :param deduplicate: 去重模式，用于为重复文件构建输出路径
+        :param old: 旧文件的扩展名
+        :param extension: 新文件的扩展名
+        """
+        self.deduplicate = deduplicate
+        self.old = old
+        self.extension = extension
+        # 每种大小第一个出现的文件
+        self.first_of_size: dict[int, str] = {}
+        self.digests: dict[str, str] = {}
+        # 哈希对应的第一个源文件，以及等待它转换完成的重复文件
+        self.originals: dict[str, str] = {}
+        self.waiting: dict[str, list[str]] = {}
+        # 已完成的源文件的错误码、输出路径和转换耗时
+        self.results: dict[str, tuple[ErrorCode, str, float]] = {}
+        # 正在转换的图像已分配的输出路径，由 _iter_convert 维护，为重复文件构建路径时需要避开
+        self.reserved: set[str] = set()
+        self.linked = 0
+        self.saved_seconds = 0.0
+
+    def _digest(self, path: str) -> str:
+        if path not in self.digests:
+            hasher = hashlib.blake2b()
+            with open(path, "rb") as f:
+                while chunk := f.read(HASH_CHUNK_SIZE):
+                    hasher.update(chunk)
+            self.digests[path] = hasher.hexdigest()
+        return self.digests[path]
+
+    def _reusable(self, original: str) -> bool:
+        return self.results[original][0] in (ErrorCode.Success, *self.SHARED_ERRORS)
+
+    def _reuse(self, image: str, original: str) -> tuple[str, ErrorCode, str]:
+        err, output, seconds = self.results[original]
+        if err != ErrorCode.Success:
+            # 内容相同，解码结果也相同
+            return image, err, ""
+        target = get_output_path(image, self.deduplicate, self.old, self.extension, self.reserved)
+        if target[0] != ErrorCode.Success:
+            return image, target[0], target[1]
+        link_res = utils.link_or_copy(output, target[1])
+        if link_res[0] != ErrorCode.Success:
+            return image, link_res[0], ""
+        self.linked += 1
+        self.saved_seconds += seconds
+        logger.info(f"{image} 与 {original} 内容相同，已通过 {link_res[1]} 创建 {target[1]}")
+        return image, ErrorCode.Success, target[1]
+
+    def admit(self, image: str) -> list[tuple[str, ErrorCode, str]] | None:
+        """
+        判断图像是否需要转换
+
+        :param image: 源文件路径
+        :return: 需要转换时返回 None，否则返回可以直接产出的结果，原文件尚未转换完成时为空列表
+        """
+        try:
+            size = os.path.getsize(image)
+            first = self.first_of_size.setdefault(size, image)
+            if first == image:
+                return None
+            first_digest = self._digest(first)
+            self.originals.setdefault(first_digest, first)
+            digest = self._digest(image)
+        except OSError as e:
+            logger.warning(f"无法计算 {image} 的内容哈希：{str(e)}")
+            return None
+        original = self.originals.setdefault(digest, image)
+        if original == image:
+            return None
+        if original in self.results:
+            if self._reusable(original):
+                return [self._reuse(image, original)]
+            # 原文件没有可复用的输出，由这个文件代替它转换
+            self.originals[digest] = image
+            return None
+        self.waiting.setdefault(digest, []).append(image)
+        return []
+
+    def complete(self, image: str,
+                 res: tuple[ErrorCode, str, float]) -> tuple[list[tuple[str, ErrorCode, str]], list[str]]:
+        """
+        记录转换结果，并处理等待这个文件的重复文件
+
+        :param image: 源文件路径
+        :param res: _convert_task 的返回值
+        :return: 元组，第一项为重复文件的结果，第二项为需要重新提交转换的重复文件
+        """
+        self.results[image] = res
+        digest = self.digests.get(image)
+        if digest is None:
+            return [], []
+        waiting = self.waiting.pop(digest, [])
+        if not waiting or self._reusable(image):
+            return [self._reuse(duplicate, image) for duplicate in waiting], []
+        # 原文件没有可复用的输出，第一个重复文件代替它转换，其余的等待这个文件
+        logger.debug(f"{image} 没有可复用的输出，改为转换 {waiting[0]}")
+        self.originals[digest] = waiting[0]
+        if waiting[1:]:
+            self.waiting[digest] = waiting[1:]
+        return [], [waiting[0]]
+
+
+def _iter_convert(images: Iterable[str], deduplicate: int, options: dict, workers: int,
+                  manifest: ConvertManifest | None = None, memory_budget: int = 0,
+                  content_dedup: ContentDedup | None = None,
+                  writers: int = 0) -> Generator[tuple[str, ErrorCode, str], None, None]:
+    """
+    逐个转换输入的图像，workers 大于1时使用进程池，结果按完成顺序返回
+
+    images 可以是惰性的迭代器，进程池模式下同时提交的任务数量被限制在进程数的两倍，
+    关闭生成器时只需等待正在运行的任务结束。
+
+    设置内存预算后，同时提交的任务数量不超过进程数，且估算的内存占用之和不超过预算，
+    超出预算的图像会等待之前的任务完成，没有其他任务时则单独运行，因此大图会单独转换，小图可以同时转换多张
+
+    writers 大于0时，编码和写入分为两个阶段：编码结果保存在内存中，交给写入线程池原子地写入磁盘，
+    编码不再等待写入完成。等待写入的结果不超过写入线程数的两倍，写入完成后才会产出结果
+
+    保留两者模式下，输出路径在提交任务前由当前进程分配，写入完成前一直保留，同时转换的图像不会选到同一个序号
+
+    :param images: 图像路径的可迭代对象
+    :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param options: encode_options 返回的编码设置
+    :param workers: 进程数
+    :param manifest: 增量转换清单，清单中没有变化的图像会直接以 FileSkipped 返回，转换成功的图像会被记录
+    :param memory_budget: 进程池模式下的内存预算（字节），0 为不限制
+    :param content_dedup: 内容去重，内容与之前的文件相同的图像不会被转换
+    :param writers: 写入线程数，0 为在编码的进程中直接写入
+    :return: 生成器，每项为输入路径、错误码和 _convert_task 返回的路径
+    """
+    image_iter = iter(images)
+    task = _encode_task if writers > 0 else _convert_task
+    writer = ThreadPoolExecutor(max_workers=writers) if writers > 0 else None
+    writes = {}
+    write_limit = writers * 2
+    # 内容去重时需要重新转换的重复文件，优先于新的图像提交
+    retry = deque()
+    # 已分配、尚未写入的输出路径，与内容去重共用
+    reserved = content_dedup.reserved if content_dedup is not None else set()
+    reserved_by: dict[str, str] = {}
+
+    def reserve(image: str) -> str:
+        if deduplicate != 2:
+            return ""
+        output_path = get_output_path(image, deduplicate, extension=ENCODERS[options["encoder"]]["extension"],
+                                      taken=reserved)[1]
+        reserved.add(output_path)
+        reserved_by[image] = output_path
+        return output_path
+
+    def next_image() -> str | None:
+        return retry.popleft() if retry else next(image_iter, None)
+
+    def admit(image: str) -> list[tuple[str, ErrorCode, str]] | None:
+        if manifest is not None and (previous := manifest.lookup(image)):
+            return [(image, ErrorCode.FileSkipped, previous)]
+        return content_dedup.admit(image) if content_dedup is not None else None
+
+    def finish(image: str, res: tuple[ErrorCode, str, float]) -> list[tuple[str, ErrorCode, str]]:
+        reserved.discard(reserved_by.pop(image, ""))
+        results = [(image, res[0], res[1])]
+        if content_dedup is not None:
+            duplicates, requeue = content_dedup.complete(image, res)
+            results.extend(duplicates)
+            retry.extend(requeue)
+        if manifest is not None:
+            for source, err, output in results:
+                if err == ErrorCode.Success:
+                    manifest.record(source, output)
+        return results
+
+    def encoded(image: str, res: tuple) -> list[tuple[str, ErrorCode, str]]:
+        # 直接写入时 res 已是最终结果，否则只有编码成功的结果需要交给写入线程
+        if writer is None:
+            return finish(image, res)
+        if res[0] != ErrorCode.Success:
+            return finish(image, res[:3])
+        writes[writer.submit(_write_result, image, res)] = image
+        return []
+
+    def written(futures) -> list[tuple[str, ErrorCode, str]]:
+        results = []
+        for future in futures:
+            results.extend(finish(writes.pop(future), future.result()))
+        return results
+
+    try:
+        if workers <= 1:
+            while True:
+                image = next_image()
+                if image is None:
+                    if not writes:
+                        break
+                    # 图像已全部提交，等待剩余的写入，写入结果可能带来需要重新转换的重复文件
+                    done, _ = wait(writes, return_when=FIRST_COMPLETED)
+                    yield from written(done)
+                    continue
+                admitted = admit(image)
+                if admitted is not None:
+                    yield from admitted
+                    continue
+                yield from encoded(image, task(image, deduplicate, options, reserve(image)))
+                if writes:
+                    # 等待写入的结果达到上限时阻塞，否则只取出已完成的结果
+                    done, _ = wait(writes, timeout=None if len(writes) >= write_limit else 0,
+                                   return_when=FIRST_COMPLETED)
+                    yield from written(done)
+            return None
+
+        logger.info(f"使用 {workers} 个进程进行转换")
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            pending = {}
+            limit = workers if memory_budget > 0 else workers * 2
+            # 已提交任务的估算内存占用，以及因超出预算而暂缓提交的图像
+            in_flight = 0
+            held = None
+            exhausted = False
+            while True:
+                # 补充任务，没有变化的图像不占用进程池；等待写入的结果过多时暂停编码
+                while len(pending) < limit and (writer is None or len(writes) < write_limit):
+                    if held is None:
+                        image = next_image()
+                        if image is None:
+                            exhausted = True
+                            break
+                        admitted = admit(image)
+                        if admitted is not None:
+                            yield from admitted
+                            continue
+                        held = image, estimate_decoded_size(image) if memory_budget > 0 else 0
+                    image, cost = held
+                    if pending and in_flight + cost > memory_budget > 0:
+                        logger.debug(f"{image} 预计占用 {cost} 字节，等待其他任务完成")
+                        break
+                    future = executor.submit(task, image, deduplicate, options, reserve(image))
+                    pending[future] = image, cost
+                    in_flight += cost
+                    held = None
+                if not pending and not writes and exhausted and not retry:
+                    break
+                done, _ = wait([*pending, *writes], return_when=FIRST_COMPLETED)
+                yield from written([future for future in done if future in writes])
+                for future in done:
+                    if future not in pending:
+                        continue
+                    image, cost = pending.pop(future)
+                    in_flight -= cost
+                    try:
+                        res = future.result()
+                    except Exception as e:
+                        # 进程池本身损坏，后续任务也无法完成
+                        logger.error(f"转换进程异常退出：{str(e)}")
+                        yield image, ErrorCode.Unknown, image
+                        return None
+                    yield from encoded(image, res)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if writer is not None:
+            # 已经编码的结果仍会写入，避免丢弃已完成的工作
+            writer.shutdown(wait=True)
+
+
+def convert_batch(images: list, quality: int, preserve_metadata: bool, deduplicate: int, workers: int = 1,
+                  manifest: ConvertManifest | None = None, target_size: int = 0, memory_budget: int = 0,
+                  max_dimension: int = 0, resample: str = "lanczos", content_dedup: bool = False,
+                  encoder: str = "jpeg", journal: ConvertJournal | None = None, writers: int = 0
+                  ) -> Generator[tuple[ErrorCode, int], None, tuple[ErrorCode, int]]:
     """
     对输入的路径列表进行批量转换
 
@@ -60,36 +967,209 @@ def convert_batch(images: list, quality: int, preserve_metadata: bool,
     :param quality: 质量
     :param preserve_metadata: 保留元数据
     :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param workers: 进程数，大于1时使用进程池并行转换，结果按完成顺序返回
+    :param manifest: 增量转换清单，为 None 时不跳过未变化的图像，调用方负责保存
+    :param target_size: 目标文件大小（字节），0 为使用固定质量
+    :param memory_budget: 进程池模式下的内存预算（字节），0 为不限制
+    :param max_dimension: 输出图像的最大边长（像素），0 为不限制
+    :param resample: 缩小图像时的重采样方式，见 RESAMPLE_FILTERS
+    :param content_dedup: 按内容去重，内容相同的图像只转换一次
+    :param encoder: 输出编码器，见 ENCODERS
+    :param journal: 任务日志，日志中已处理的图像会被跳过，处理结果会被记录，调用方负责保存或删除
+    :param writers: 写入线程数，大于0时编码和写入并行进行，0 为编码后直接写入
     :return: 返回生成器，第一项为当前进度，第二项为错误码
     """
+    if journal is not None:
+        images = [image for image in images if not journal.is_resolved(image)]
     if not images:
         logger.info("输入列表为空")
         return ErrorCode.EmptyList, 0
-    else:
-        length = len(images)
-        for index, image in enumerate(images):
-            try:
-                logger.info(f"正在转换：{image}")
-                if not os.path.exists(image):
-                    logger.error(ErrorCode.InvalidPath.format(image))
-                    return ErrorCode.InvalidPath, 0
-                res = convert_single(input_path=image, quality=quality, preserve_metadata=preserve_metadata,
-                                     deduplicate=deduplicate)
-                if res[0] == ErrorCode.Success:
-                    yield ErrorCode.Success, int(((index + 1) / length) * 100)
-                elif res[0] == ErrorCode.FileSkipped:
-                    logger.warning(f"已跳过：{image}")
-                    yield ErrorCode.FileSkipped, int(((index + 1) / length) * 100)
-                else:
-                    logger.error(res[0].format(image))
-                    return res[0], int(((index + 1) / length) * 100)
-            except UnidentifiedImageError:
-                logger.error(ErrorCode.BrokenImage.format(image))
-                yield ErrorCode.BrokenImage, int(((index + 1) / length) * 100)
-            except Exception as e:
-                logger.error(f"转换失败：{str(e)}")
-                yield ErrorCode.Unknown, int(((index + 1) / length) * 100)
-        return ErrorCode.Success, 100
+    if encoder not in ENCODERS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的编码器 {encoder}"))
+        return ErrorCode.InvalidArgument, 0
+    length = len(images)
+    options = encode_options(quality, preserve_metadata, target_size, max_dimension, resample, encoder)
+    dedup = ContentDedup(deduplicate, extension=ENCODERS[encoder]["extension"]) if content_dedup else None
+    with closing(_iter_convert(images, deduplicate, options, workers, manifest, memory_budget, dedup,
+                               writers)) as results:
+        for index, (image, err, _) in enumerate(results, 1):
+            progress = int((index / length) * 100)
+            if journal is not None:
+                journal.resolve(image, err)
+            if err == ErrorCode.Success:
+                yield ErrorCode.Success, progress
+            elif err == ErrorCode.FileSkipped:
+                logger.warning(f"已跳过：{image}")
+                yield ErrorCode.FileSkipped, progress
+            elif err in (ErrorCode.BrokenImage, ErrorCode.Unknown):
+                yield err, progress
+            else:
+                logger.error(err.format(image))
+                return err, progress
+    if dedup is not None:
+        logger.info(f"内容去重：复用了 {dedup.linked} 项转换结果，节省约 {dedup.saved_seconds:.1f} 秒")
+    return ErrorCode.Success, 100
+
+
+def _read_png_ihdr(f) -> tuple[int, int, int, int] | None:
+    """
+    从文件开头读取PNG签名和IHDR块
+
+    :param f: 以二进制模式打开、位于文件开头的文件对象，读取后位于IHDR之后的第一个块
+    :return: 元组，依次为宽、高、位深和颜色类型，不是有效的PNG时返回 None
+    """
+    header = f.read(33)
+    # 签名(8) + IHDR长度(4) + "IHDR"(4) + 宽高(8) + 位深(1) + 颜色类型(1) + 其余(3) + CRC(4)
+    if len(header) < 33 or not header.startswith(PNG_SIGNATURE) or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">IIBB", header[16:26])
+
+
+def estimate_decoded_size(path: str) -> int:
+    """
+    根据文件头中的尺寸和模式估算转换时的内存占用，不会解码图像
+
+    Pillow 中单通道8位图像每像素占1字节，其他模式按每像素4字节计算
+
+    :param path: 图像路径
+    :return: 估算的字节数，无法读取文件头时返回 0
+    """
+    try:
+        with open(path, "rb") as f:
+            ihdr = _read_png_ihdr(f)
+        if ihdr is not None:
+            width, height, bit_depth, color_type = ihdr
+            single_byte = color_type == 3 or (color_type == 0 and bit_depth <= 8)
+        else:
+            with Image.open(path) as img:
+                width, height = img.size
+                single_byte = img.mode in ("1", "L", "P")
+    except Exception as e:
+        logger.warning(f"无法估算 {path} 的内存占用：{str(e)}")
+        return 0
+    return width * height * (1 if single_byte else 4) * DECODE_COPIES
+
+
+def _probe_png_alpha(path: str) -> bool | None:
+    """
+    只读取PNG文件头判断图像是否有透明通道
+
+    IHDR 的颜色类型为 4（灰度+透明）或 6（RGBA）时有透明通道，其他颜色类型则在 IDAT 之前查找 tRNS 块，
+    只会读取各个块的头部，不会解码图像数据
+
+    :param path: 图像路径
+    :return: 有透明通道为 True，没有为 False，无法从文件头判断时为 None
+    """
+    try:
+        with open(path, "rb") as f:
+            ihdr = _read_png_ihdr(f)
+            if ihdr is None:
+                return None
+            color_type = ihdr[3]
+            if color_type in (4, 6):
+                return True
+            if color_type not in (0, 2, 3):
+                return None
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                length, chunk_type = struct.unpack(">I4s", chunk_header)
+                if chunk_type == b"tRNS":
+                    return True
+                if chunk_type in (b"IDAT", b"IEND"):
+                    return False
+                # 跳过数据和CRC
+                f.seek(length + 4, os.SEEK_CUR)
+    except OSError as e:
+        logger.warning(f"无法读取 {path} 的文件头：{str(e)}")
+        return None
+
+
+def has_transparency(path: str) -> bool:
+    """
+    判断PNG图像是否有透明通道，优先只读取文件头，无法判断时再交给Pillow
+
+    :param path: 图像路径
+    :return: 是否有透明通道，Pillow也无法读取时返回 False，交给后续转换步骤报告错误
+    """
+    probe = _probe_png_alpha(path)
+    if probe is not None:
+        return probe
+    logger.debug(f"无法从文件头判断 {path} 的透明通道，使用Pillow读取")
+    try:
+        with Image.open(path) as img:
+            logger.debug(f"图像 {path} 的模式：{img.mode}")
+            return 'A' in img.mode or "transparency" in img.info
+    except Exception as e:
+        logger.warning(f"无法读取图像 {path}：{str(e)}")
+        return False
+
+
+def scan_png_files(folder: str, recursive: bool,
+                   journal: ConvertJournal | None = None) -> Generator[str, None, None]:
+    """
+    使用 os.scandir 逐个产出文件夹中的PNG文件，和 glob 一样会跳过以 . 开头的文件和文件夹
+
+    :param folder: 要查找的路径
+    :param recursive: 是否递归查找，不会进入符号链接指向的文件夹
+    :param journal: 任务日志，提供时每个文件夹读取完后才产出其中的文件，已处理的文件和子树会被跳过
+    :return: 生成器，每项为一个PNG文件的路径
+    """
+    if journal is not None and journal.skip_directory(folder):
+        logger.info(f"{folder} 已在之前处理完")
+        return None
+    pending_dirs = [folder]
+    while pending_dirs:
+        current = pending_dirs.pop()
+        files, subdirs = [], []
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    try:
+                        if entry.is_file():
+                            if not entry.name.lower().endswith(".png"):
+                                continue
+                            if journal is None:
+                                yield entry.path
+                            else:
+                                files.append(entry.path)
+                        elif recursive and entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                    except OSError as e:
+                        logger.warning(f"无法读取 {entry.path}：{str(e)}")
+        except PermissionError:
+            logger.warning(ErrorCode.NotPermitted.format(current))
+        if journal is not None:
+            files, subdirs = journal.directory_listed(current, files, subdirs)
+            yield from files
+        pending_dirs.extend(subdirs)
+
+
+def iter_image_list(folder: str, recursive: bool, pass_trans: bool,
+                    journal: ConvertJournal | None = None) -> Generator[str, None, None]:
+    """
+    逐个产出需要转换的PNG图像，跳过透明图像时按块并行探测
+
+    :param folder: 要查找的路径
+    :param recursive: 是否递归查找
+    :param pass_trans: 是否跳过有透明通道的图像
+    :param journal: 任务日志，见 scan_png_files，因透明而跳过的图像记为 skipped
+    :return: 生成器，每项为一个图像路径
+    """
+    png_files = scan_png_files(folder, recursive, journal)
+    if not pass_trans:
+        yield from png_files
+        return None
+    with ThreadPoolExecutor(max_workers=PROBE_THREADS) as executor:
+        while chunk := list(islice(png_files, PROBE_THREADS * 4)):
+            for png, has_alpha in zip(chunk, executor.map(has_transparency, chunk)):
+                if not has_alpha:
+                    yield png
+                elif journal is not None:
+                    journal.resolve(png, ErrorCode.FileSkipped)
 
 
 def get_image_list(folder: str, recursive: bool, pass_trans: bool) -> tuple[ErrorCode, list]:
@@ -105,27 +1185,144 @@ def get_image_list(folder: str, recursive: bool, pass_trans: bool) -> tuple[Erro
         if not folder or not os.path.exists(folder):
             logger.error(f"路径为空或找不到指定的路径")
             return ErrorCode.InvalidPath, []
-        # 确定pattern
-        if recursive:
-            logger.info(f"递归扫描文件夹：{folder}")
-            pattern = os.path.join(folder, '**', '*.[Pp][Nn][Gg]')
-        else:
-            logger.info(f"扫描文件夹：{folder}")
-            pattern = os.path.join(folder, '*.[Pp][Nn][Gg]')
-        # 查找图像
-        png_files = glob.glob(pattern, recursive=recursive)
-        # 移除透明图片
-        if pass_trans:
-            valid_files = []
-            for png in png_files:
-                with Image.open(png) as img:
-                    if 'A' not in img.mode:
-                        logger.debug(f"图像 {png} 的模式：{img.mode}")
-                        valid_files.append(png)
-            png_files = valid_files
+        logger.info(f"{'递归' if recursive else ''}扫描文件夹：{folder}")
+        png_files = list(iter_image_list(folder, recursive, pass_trans))
         # 返回值
         logger.info(f"共找到 {len(png_files)} 项文件")
         return ErrorCode.Success, png_files
     except Exception as e:
         logger.error(f"查找失败：{str(e)}")
         return ErrorCode.Unknown, []
+
+
+def convert_stream(folder: str, recursive: bool, pass_trans: bool, quality: int, preserve_metadata: bool,
+                   deduplicate: int, workers: int = 1, incremental: bool = False,
+                   target_size: int = 0, memory_budget: int = 0, max_dimension: int = 0,
+                   resample: str = "lanczos", content_dedup: bool = False,
+                   encoder: str = "jpeg", journal: bool = False, resume: bool = False,
+                   writers: int = 0) -> Generator[tuple[ErrorCode, StreamProgress], None, None]:
+    """
+    边查找边转换，查找在后台线程中进行，找到的图像通过有界队列交给转换步骤，不需要等待整个目录扫描完成
+
+    错误处理与 convert_batch 一致：跳过和损坏的图像会继续处理，其他错误会在产出后终止
+
+    :param folder: 要查找的路径
+    :param recursive: 是否递归查找
+    :param pass_trans: 是否跳过有透明通道的图像
+    :param quality: 质量
+    :param preserve_metadata: 保留元数据
+    :param deduplicate: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
+    :param workers: 进程数，大于1时使用进程池并行转换
+    :param incremental: 使用保存在 folder 下的转换清单，跳过上次转换后没有变化的图像
+    :param target_size: 目标文件大小（字节），0 为使用固定质量
+    :param memory_budget: 进程池模式下的内存预算（字节），0 为不限制
+    :param max_dimension: 输出图像的最大边长（像素），0 为不限制
+    :param resample: 缩小图像时的重采样方式，见 RESAMPLE_FILTERS
+    :param content_dedup: 按内容去重，内容相同的图像只转换一次，saved_seconds 为因此节省的转换时间
+    :param encoder: 输出编码器，见 ENCODERS
+    :param journal: 在 folder 下记录任务日志，任务被终止后可以继续，正常完成后日志会被删除
+    :param resume: 读取已有的任务日志，跳过已处理的文件和子树，同时会启用 journal
+    :param writers: 写入线程数，大于0时编码和写入并行进行，0 为编码后直接写入
+    :return: 生成器，每项为错误码和当前进度，没有找到图像时产出 NoImageFound
+    """
+    if not folder or not os.path.exists(folder):
+        logger.error(ErrorCode.InvalidPath.format(folder))
+        yield ErrorCode.InvalidPath, StreamProgress(source=folder, output="", converted=0, discovered=0,
+                                                    discovery_done=True, saved_seconds=0.0)
+        return None
+    if encoder not in ENCODERS:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的编码器 {encoder}"))
+        yield ErrorCode.InvalidArgument, StreamProgress(source=folder, output="", converted=0, discovered=0,
+                                                        discovery_done=True, saved_seconds=0.0)
+        return None
+
+    task_queue: queue.Queue[str | None] = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+    stop_event = threading.Event()
+    state = {"discovered": 0, "done": False, "error": ErrorCode.Success}
+
+    def enqueue(item: str | None) -> bool:
+        # 队列已满时定期检查是否需要停止，避免在生成器关闭后一直阻塞
+        while not stop_event.is_set():
+            try:
+                task_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def discover():
+        try:
+            for png in iter_image_list(folder, recursive, pass_trans, job):
+                state["discovered"] += 1
+                if not enqueue(png):
+                    return
+        except Exception as e:
+            logger.error(f"查找失败：{str(e)}")
+            state["error"] = ErrorCode.Unknown
+        finally:
+            state["done"] = True
+            logger.info(f"查找结束，共找到 {state['discovered']} 项文件")
+            # 结束标记排在所有路径之后，是转换步骤唯一的正常退出点，队列中剩余的路径不会被遗漏
+            enqueue(None)
+
+    def queued_images():
+        while not stop_event.is_set():
+            try:
+                png = task_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if png is None:
+                return
+            yield png
+
+    def progress(source: str, output: str, converted: int) -> StreamProgress:
+        return StreamProgress(source=source, output=output, converted=converted,
+                              discovered=state["discovered"], discovery_done=state["done"],
+                              saved_seconds=dedup.saved_seconds if dedup is not None else 0.0)
+
+    logger.info(f"{'递归' if recursive else ''}扫描并转换文件夹：{folder}")
+    options = encode_options(quality, preserve_metadata, target_size, max_dimension, resample, encoder)
+    manifest = ConvertManifest(folder, options) if incremental else None
+    dedup = ContentDedup(deduplicate, extension=ENCODERS[encoder]["extension"]) if content_dedup else None
+    job = ConvertJournal(folder, {**options, "recursive": recursive, "pass_trans": pass_trans,
+                                  "deduplicate": deduplicate}, resume) if journal or resume else None
+    discover_thread = threading.Thread(target=discover, daemon=True)
+    discover_thread.start()
+    converted = 0
+    completed = False
+    try:
+        with closing(_iter_convert(queued_images(), deduplicate, options, workers, manifest, memory_budget,
+                                   dedup, writers)) as results:
+            for image, err, output in results:
+                converted += 1
+                if job is not None:
+                    job.resolve(image, err)
+                if err == ErrorCode.FileSkipped:
+                    logger.warning(f"已跳过：{image}")
+                elif err not in (ErrorCode.Success, ErrorCode.BrokenImage, ErrorCode.Unknown):
+                    logger.error(err.format(image))
+                    yield err, progress(image, output, converted)
+                    return None
+                yield err, progress(image, output, converted)
+        completed = True
+    finally:
+        stop_event.set()
+        discover_thread.join()
+        if manifest is not None:
+            manifest.save()
+        if job is not None:
+            if job.resumed:
+                logger.info(f"继续任务，跳过了 {job.resumed} 项已处理的文件")
+            if completed and state["error"] == ErrorCode.Success:
+                job.discard()
+            else:
+                job.save()
+        if dedup is not None:
+            logger.info(f"内容去重：复用了 {dedup.linked} 项转换结果，节省约 {dedup.saved_seconds:.1f} 秒")
+
+    if state["error"] != ErrorCode.Success:
+        yield state["error"], progress(folder, "", converted)
+    elif not converted:
+        logger.error(ErrorCode.NoImageFound.generic)
+        yield ErrorCode.NoImageFound, progress(folder, "", converted)
+    return None
@@ -0,0 +1,124 @@
+import io
+import time
+from itertools import islice
+from typing import TypedDict
+
+from PIL import Image
+
+from core import log_manager
+from core.error_codes import ErrorCode
+from modules.conv import PNG2JPG
+
+logger = log_manager.get_logger(__name__)
+
+
+class BenchResult(TypedDict):
+    """单个编码器在某个质量下的测试结果"""
+    encoder: str
+    quality: int
+    images: int
+    decoded_bytes: int
+    output_bytes: int
+    seconds: float
+    mb_per_second: float
+
+
+def load_samples(folder: str, sample_size: int, recursive: bool = False) -> tuple[ErrorCode, list[Image.Image]]:
+    """
+    读取文件夹中的PNG图像作为样本，所有图像都会被完整解码，之后的编码测试不再包含解码时间。
+
+    Args:
+        folder: 样本文件夹路径
+        sample_size: 最多读取的图像数量
+        recursive: 是否递归查找
+
+    Returns:
+        包含错误码和已解码图像列表的元组，没有可用的图像时错误码为 NoImageFound
+    """
+    samples = []
+    for path in islice(PNG2JPG.scan_png_files(folder, recursive), sample_size):
+        try:
+            with Image.open(path) as image:
+                image.load()
+                samples.append(image.copy())
+        except Exception as e:
+            logger.warning(f"无法读取样本 {path}：{str(e)}")
+    if not samples:
+        logger.error(ErrorCode.NoImageFound.generic)
+        return ErrorCode.NoImageFound, []
+    logger.info(f"已读取 {len(samples)} 张样本")
+    return ErrorCode.Success, samples
+
+
+def _prepare(image: Image.Image, supports_alpha: bool) -> Image.Image:
+    """按 PNG2JPG.convert_single 的规则转换模式，不支持透明通道的编码器只接收 RGB 图像"""
+    if image.mode in ("1", "P") or ('A' in image.mode and not supports_alpha):
+        return image.convert("RGBA" if supports_alpha and image.has_transparency_data else "RGB")
+    return image
+
+
+def benchmark_encoders(folder: str, sample_size: int = 20, qualities: tuple[int, ...] = (75, 90),
+                       encoders: list[str] | None = None,
+                       recursive: bool = False) -> tuple[ErrorCode, list[BenchResult]]:
+    """
+    测试各个编码器在不同质量下的编码速度和输出大小，编码结果只写入内存，不会产生文件。
+
+    速度按解码后的像素数据量计算，即每秒能编码多少 MB 的原始图像，与源文件的压缩率无关。
+
+    Args:
+        folder: 样本文件夹路径
+        sample_size: 最多使用的样本数量
+        qualities: 要测试的质量
+        encoders: 要测试的编码器，见 PNG2JPG.ENCODERS，为 None 时测试全部
+        recursive: 是否递归查找样本
+
+    Returns:
+        包含错误码和测试结果列表的元组
+    """
+    encoders = list(PNG2JPG.ENCODERS) if encoders is None else encoders
+    unknown = [key for key in encoders if key not in PNG2JPG.ENCODERS]
+    if unknown:
+        logger.error(ErrorCode.InvalidArgument.format(f"未知的编码器 {unknown}"))
+        return ErrorCode.InvalidArgument, []
+    load_res = load_samples(folder, sample_size, recursive)
+    if load_res[0] != ErrorCode.Success:
+        return load_res[0], []
+
+    results = []
+    for key in encoders:
+        encoder = PNG2JPG.ENCODERS[key]
+        # 模式转换不计入编码时间
+        prepared = [_prepare(image, encoder["supports_alpha"]) for image in load_res[1]]
+        decoded_bytes = sum(len(image.getbands()) * image.width * image.height for image in prepared)
+        for quality in qualities:
+            output_bytes = 0
+            start = time.perf_counter()
+            for image in prepared:
+                buffer = io.BytesIO()
+                image.save(buffer, encoder["format"], quality=quality, **encoder["params"])
+                output_bytes += buffer.tell()
+            seconds = time.perf_counter() - start
+            result = BenchResult(encoder=key, quality=quality, images=len(prepared), decoded_bytes=decoded_bytes,
+                                 output_bytes=output_bytes, seconds=seconds,
+                                 mb_per_second=decoded_bytes / 1024 ** 2 / seconds if seconds else 0.0)
+            logger.info(f"{key} 质量 {quality}：{result['mb_per_second']:.1f} MB/s，输出 {output_bytes} 字节")
+            results.append(result)
+    return ErrorCode.Success, results
+
+
+def format_report(results: list[BenchResult]) -> str:
+    """
+    将测试结果整理为文本表格。
+
+    Args:
+        results: benchmark_encoders 返回的结果列表
+
+    Returns:
+        表格文本，压缩比为输出大小占解码后数据量的比例
+    """
+    lines = [f"{'编码器':<18}{'质量':>6}{'MB/s':>10}{'输出字节':>14}{'压缩比':>10}"]
+    for result in results:
+        ratio = result["output_bytes"] / result["decoded_bytes"] if result["decoded_bytes"] else 0.0
+        lines.append(f"{result['encoder']:<18}{result['quality']:>6}{result['mb_per_second']:>10.1f}"
+                     f"{result['output_bytes']:>14}{ratio:>10.2%}")
+    return "\n".join(lines)
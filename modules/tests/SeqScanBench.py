@@ -0,0 +1,103 @@
+import os
+import re
+import time
+from collections import defaultdict
+from typing import Callable
+
+from core import log_manager
+from core.error_codes import ErrorCode
+from modules.conv import ImgSeq2PDF
+
+logger = log_manager.get_logger(__name__)
+
+
+def build_fixture(target: str, amount: int = 100_000, group_size: int = 50, subfolders: int = 10) -> ErrorCode:
+    """
+    生成用于测试序列查找的空文件，一半放在根文件夹中，其余平均分配到子文件夹中。
+
+    Args:
+        target: 目标文件夹路径，若不存在则会创建
+        amount: 文件总数
+        group_size: 每个序列的文件数量，序列越多，旧实现中重复构建文件列表的开销越大
+        subfolders: 子文件夹数量
+
+    Returns:
+        错误码
+    """
+    logger.info(f"正在 {target} 下生成 {amount} 个测试文件")
+    folders = [target] + [os.path.join(target, f"sub_{i}") for i in range(subfolders)]
+    try:
+        for folder in folders:
+            os.makedirs(folder, exist_ok=True)
+        for i in range(amount):
+            # 一半文件在根文件夹，形成宽文件夹
+            folder = target if i % 2 == 0 or not subfolders else folders[1 + i % subfolders]
+            with open(os.path.join(folder, f"seq_{i // group_size}_{i % group_size}.jpg"), "wb"):
+                pass
+    except OSError as e:
+        logger.error(ErrorCode.CannotWriteFile.format(str(e)))
+        return ErrorCode.CannotWriteFile
+    return ErrorCode.Success
+
+
+def _legacy_find(root_folder: str, recursive: bool) -> list:
+    """旧的查找实现：两次 listdir 加逐项 isdir/isfile，且每个序列都重新构建整个文件夹的列表"""
+    def process(dirpath, dirnames, filenames):
+        groups = defaultdict(list)
+        pattern = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
+        for filename in filenames:
+            if match := pattern.match(filename):
+                prefix, number_str, extension = match.groups()
+                if extension.lower() in ImgSeq2PDF.IMAGE_EXTENSIONS:
+                    groups[(prefix, extension)].append((int(number_str), os.path.join(dirpath, filename)))
+        sequences = []
+        for files in groups.values():
+            if len(files) > 1:
+                files.sort(key=lambda x: x[0])
+                all_files = [os.path.join(dirpath, f) for f in filenames] + \
+                            [os.path.join(dirpath, d) for d in dirnames]
+                sequences.append({"sequence": [path for _, path in files], "all_files": all_files})
+        return sequences
+
+    results = []
+    if recursive:
+        for dirpath, dirnames, filenames in os.walk(root_folder):
+            results.extend(process(dirpath, dirnames, filenames))
+    else:
+        dirnames = [d for d in os.listdir(root_folder) if os.path.isdir(os.path.join(root_folder, d))]
+        filenames = [f for f in os.listdir(root_folder) if os.path.isfile(os.path.join(root_folder, f))]
+        results.extend(process(root_folder, dirnames, filenames))
+    return results
+
+
+def _best_time(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_discovery(target: str, recursive: bool = True, repeat: int = 3) -> tuple[ErrorCode, dict[str, float]]:
+    """
+    比较当前的 find_image_sequences 和旧实现在同一文件夹上的耗时，取多次运行中最短的一次。
+
+    第一次运行会预热文件系统缓存，结果主要反映目录遍历和分组本身的开销。
+
+    Args:
+        target: 测试文件夹，可以用 build_fixture 生成
+        recursive: 是否递归查找
+        repeat: 每种实现的运行次数
+
+    Returns:
+        包含错误码和结果的元组，结果中包含 current、legacy 的耗时（秒）和 speedup
+    """
+    if not os.path.isdir(target):
+        logger.error(ErrorCode.InvalidPath.format(target))
+        return ErrorCode.InvalidPath, {}
+    current = _best_time(lambda: ImgSeq2PDF.find_image_sequences(target, recursive), repeat)
+    legacy = _best_time(lambda: _legacy_find(target, recursive), repeat)
+    result = {"current": current, "legacy": legacy, "speedup": legacy / current if current else 0.0}
+    logger.info(f"序列查找耗时：当前 {current:.3f} 秒，旧实现 {legacy:.3f} 秒，加速 {result['speedup']:.1f} 倍")
+    return ErrorCode.Success, result
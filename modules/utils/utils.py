@@ -1,4 +1,4 @@
-import os, re
+import os, re, shutil, uuid
 from typing import Any, Tuple
 
 import requests
@@ -6,8 +6,19 @@ import requests
 from core import log_manager
 from core.error_codes import ErrorCode
 
+try:
+    import fcntl
+except ImportError:
+    # Windows 没有 fcntl，无法使用 reflink
+    fcntl = None
+
 logger = log_manager.get_logger(__name__)
 
+# Linux 的 FICLONE ioctl，在 Btrfs、XFS 等文件系统上创建写时复制的副本
+FICLONE = 0x40049409
+# 每对源和目标文件系统（以设备号区分）上第一次成功的链接方式
+_link_methods: dict[tuple[int, int], str] = {}
+
 
 def remove_substring(source_string: str, substring: str | list, remove_type: str) -> str:
     """
@@ -51,22 +62,25 @@ def remove_substring(source_string: str, substring: str | list, remove_type: str
         return source_string
 
 
-def get_unique_filename(path: str) -> tuple[ErrorCode, str]:
+def get_unique_filename(path: str, taken: set[str] | None = None) -> tuple[ErrorCode, str]:
     """
     获取唯一的文件名，为重名的文件添加序号
     :param path: 要处理的路径
+    :param taken: 已分配但尚未写入磁盘的路径，与已存在的文件同样视为重名
     :return: 元组，第一项为错误码，第二项为唯一文件路径
     """
     logger.debug(f"为 {path} 获取唯一的文件名")
     dir_path = os.path.dirname(path) or '.'
     filename, ext = os.path.splitext(os.path.basename(path))
+    taken = taken or set()
 
     # 文件不存在 - 没有重名
-    if not os.path.exists(path):
+    if not os.path.exists(path) and path not in taken:
         logger.debug("没有检测到重复文件")
         return ErrorCode.Success, path
     # 文件存在 - 有重名
-    files = os.listdir(dir_path)
+    files = os.listdir(dir_path) + [os.path.basename(item) for item in taken
+                                    if os.path.dirname(item) == os.path.dirname(path)]
     pattern_str = f"^{re.escape(filename)}_(\\d+){re.escape(ext)}$"
     logger.debug(f"检测到重复文件，构建正则表达式：{pattern_str}")
     pattern = re.compile(pattern_str)
@@ -82,7 +96,7 @@ def get_unique_filename(path: str) -> tuple[ErrorCode, str]:
     return ErrorCode.Success, os.path.join(dir_path, new_filename)
 
 
-def filename_deduplicate(mode: int, path: str) -> tuple[ErrorCode, str]:
+def filename_deduplicate(mode: int, path: str, taken: set[str] | None = None) -> tuple[ErrorCode, str]:
     """
     对get_unique_filename的简单封装，以适配UI的三种去重模式
 
@@ -93,6 +107,7 @@ def filename_deduplicate(mode: int, path: str) -> tuple[ErrorCode, str]:
     Args:
         mode: 去重模式，0 - 覆盖，1 - 跳过，2 - 保留两者（会添加序号）
         path: 要去重的路径
+        taken: 已分配但尚未写入磁盘的路径，保留两者模式下会避开这些路径
 
     Returns:
         （错误码，去重后的文件名）
@@ -103,7 +118,7 @@ def filename_deduplicate(mode: int, path: str) -> tuple[ErrorCode, str]:
         return ErrorCode.Success, path
     # 保留两者 - 去重
     elif mode == 2:
-        return get_unique_filename(path)
+        return get_unique_filename(path, taken)
     # 跳过模式且文件当前存在 或 其他模式 - 什么都不做
     else:
         return ErrorCode.FileSkipped, path
@@ -140,6 +155,92 @@ def build_output_path(input_path: str, prefix: str = "", suffix: str = "",
         return err, output_path
 
 
+def _reflink(src: str, dst: str):
+    if fcntl is None:
+        raise OSError("当前系统不支持 reflink")
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            dst_file.close()
+            os.remove(dst)
+            raise
+
+
+def link_or_copy(src: str, dst: str) -> tuple[ErrorCode, str]:
+    """
+    为已有文件创建一个相同内容的副本，依次尝试 reflink、硬链接和复制
+
+    每对源和目标文件系统上第一次成功的方式会被记住，之后从这种方式开始尝试，不再重复尝试不支持的方式。
+    跨文件系统时硬链接总会失败，因此不会影响同一文件系统内的链接方式。dst 已存在时会被替换
+
+    Args:
+        src: 源文件
+        dst: 目标文件
+
+    Returns:
+        第一项为错误码，第二项为使用的方式：reflink、hardlink 或 copy
+    """
+    methods = {"reflink": _reflink, "hardlink": os.link, "copy": shutil.copyfile}
+    try:
+        device = os.stat(src).st_dev, os.stat(os.path.dirname(dst) or ".").st_dev
+    except OSError as e:
+        logger.error(ErrorCode.InvalidPath.format(f"{src} -> {dst}，{str(e)}"))
+        return ErrorCode.InvalidPath, ""
+    order = list(methods)
+    if device in _link_methods:
+        order = order[order.index(_link_methods[device]):]
+    try:
+        if os.path.lexists(dst):
+            os.remove(dst)
+    except OSError as e:
+        # 文件被占用、没有权限或 dst 是文件夹
+        logger.error(ErrorCode.CannotWriteFile.format(f"{dst}，{str(e)}"))
+        return ErrorCode.CannotWriteFile, ""
+    for name in order:
+        try:
+            methods[name](src, dst)
+            _link_methods.setdefault(device, name)
+            logger.debug(f"已使用 {name} 将 {src} 链接到 {dst}")
+            return ErrorCode.Success, name
+        except OSError as e:
+            logger.debug(f"无法使用 {name} 将 {src} 链接到 {dst}：{str(e)}")
+    logger.error(ErrorCode.CannotWriteFile.format(dst))
+    return ErrorCode.CannotWriteFile, ""
+
+
+def atomic_write(path: str, data: bytes) -> ErrorCode:
+    """
+    原子地写入文件，先写入同一文件夹下的临时文件，再重命名为目标文件
+
+    写入中途失败或程序崩溃时，目标文件要么是旧的内容，要么不存在，不会留下写了一半的文件
+
+    Args:
+        path: 目标文件，已存在时会被替换
+        data: 要写入的数据
+
+    Returns:
+        错误码，Success 或 CannotWriteFile
+    """
+    folder, name = os.path.split(path)
+    # 以 . 开头，查找文件时会被跳过；不使用 mkstemp，使新文件的权限与直接写入时相同
+    temp_path = os.path.join(folder, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(temp_path, "xb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        logger.debug(f"已写入 {path}，{len(data)} 字节")
+        return ErrorCode.Success
+    except OSError as e:
+        logger.error(ErrorCode.CannotWriteFile.format(f"{path}，{str(e)}"))
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                logger.warning(ErrorCode.CannotDelTempFile.format(temp_path))
+        return ErrorCode.CannotWriteFile
+
+
 def get_list(path: str, include_path: bool = False, scan_type: str = "local",
              sub_url: str = "", location: Any = None) -> Tuple[int, str | list[str]]:
     """
@@ -122,6 +122,30 @@ class Ui_Form(object):
 
         self.PNG2JPGOptions.addWidget(self.PNG2JPGDedup, 1, 1, 1, 2)
 
+        self.PNG2JPGContentDedup = QPushButton(self.PNG2JPG)
+        self.PNG2JPGContentDedup.setObjectName(u"PNG2JPGContentDedup")
+        self.PNG2JPGContentDedup.setCheckable(True)
+
+        self.PNG2JPGOptions.addWidget(self.PNG2JPGContentDedup, 2, 0, 1, 1)
+
+        self.PNG2JPGEncoder = QComboBox(self.PNG2JPG)
+        self.PNG2JPGEncoder.setObjectName(u"PNG2JPGEncoder")
+
+        self.PNG2JPGOptions.addWidget(self.PNG2JPGEncoder, 2, 1, 1, 2)
+
+        self.PNG2JPGJournal = QPushButton(self.PNG2JPG)
+        self.PNG2JPGJournal.setObjectName(u"PNG2JPGJournal")
+        self.PNG2JPGJournal.setCheckable(True)
+
+        self.PNG2JPGOptions.addWidget(self.PNG2JPGJournal, 3, 0, 1, 1)
+
+        self.PNG2JPGIncremental = QPushButton(self.PNG2JPG)
+        self.PNG2JPGIncremental.setObjectName(u"PNG2JPGIncremental")
+        self.PNG2JPGIncremental.setCheckable(True)
+        self.PNG2JPGIncremental.setChecked(True)
+
+        self.PNG2JPGOptions.addWidget(self.PNG2JPGIncremental, 3, 1, 1, 1)
+
 
         self.verticalLayout.addLayout(self.PNG2JPGOptions)
 
@@ -146,6 +170,20 @@ class Ui_Form(object):
 
         self.PNG2JPGQuality.addWidget(self.PNG2JPGQualityNum)
 
+        self.PNG2JPGTargetSize = QSpinBox(self.PNG2JPG)
+        self.PNG2JPGTargetSize.setObjectName(u"PNG2JPGTargetSize")
+        self.PNG2JPGTargetSize.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.PNG2JPGTargetSize.setMaximum(1048576)
+
+        self.PNG2JPGQuality.addWidget(self.PNG2JPGTargetSize)
+
+        self.PNG2JPGMaxSize = QSpinBox(self.PNG2JPG)
+        self.PNG2JPGMaxSize.setObjectName(u"PNG2JPGMaxSize")
+        self.PNG2JPGMaxSize.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.PNG2JPGMaxSize.setMaximum(65535)
+
+        self.PNG2JPGQuality.addWidget(self.PNG2JPGMaxSize)
+
 
         self.verticalLayout.addLayout(self.PNG2JPGQuality)
 
@@ -167,6 +205,11 @@ class Ui_Form(object):
 
         self.PNG2JPGBtns.addWidget(self.PNG2JPGRun)
 
+        self.PNG2JPGResume = QPushButton(self.PNG2JPG)
+        self.PNG2JPGResume.setObjectName(u"PNG2JPGResume")
+
+        self.PNG2JPGBtns.addWidget(self.PNG2JPGResume)
+
         self.PNG2JPGStop = QPushButton(self.PNG2JPG)
         self.PNG2JPGStop.setObjectName(u"PNG2JPGStop")
         self.PNG2JPGStop.setEnabled(False)
@@ -215,6 +258,51 @@ class Ui_Form(object):
 
         self.Seq2PDOptions.addWidget(self.Seq2PDFRecursive)
 
+        self.Seq2PDFArchives = QPushButton(self.Seq2PDF)
+        self.Seq2PDFArchives.setObjectName(u"Seq2PDFArchives")
+        self.Seq2PDFArchives.setCheckable(True)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFArchives)
+
+        self.Seq2PDFFormat = QComboBox(self.Seq2PDF)
+        self.Seq2PDFFormat.setObjectName(u"Seq2PDFFormat")
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFFormat)
+
+        self.Seq2PDFAppend = QPushButton(self.Seq2PDF)
+        self.Seq2PDFAppend.setObjectName(u"Seq2PDFAppend")
+        self.Seq2PDFAppend.setCheckable(True)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFAppend)
+
+        self.Seq2PDFMaxDPI = QSpinBox(self.Seq2PDF)
+        self.Seq2PDFMaxDPI.setObjectName(u"Seq2PDFMaxDPI")
+        self.Seq2PDFMaxDPI.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.Seq2PDFMaxDPI.setMaximum(4800)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFMaxDPI)
+
+        self.Seq2PDFMaxSize = QSpinBox(self.Seq2PDF)
+        self.Seq2PDFMaxSize.setObjectName(u"Seq2PDFMaxSize")
+        self.Seq2PDFMaxSize.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.Seq2PDFMaxSize.setMaximum(65535)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFMaxSize)
+
+        self.Seq2PDFVolumePages = QSpinBox(self.Seq2PDF)
+        self.Seq2PDFVolumePages.setObjectName(u"Seq2PDFVolumePages")
+        self.Seq2PDFVolumePages.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.Seq2PDFVolumePages.setMaximum(100000)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFVolumePages)
+
+        self.Seq2PDFVolumeSize = QSpinBox(self.Seq2PDF)
+        self.Seq2PDFVolumeSize.setObjectName(u"Seq2PDFVolumeSize")
+        self.Seq2PDFVolumeSize.setButtonSymbols(QAbstractSpinBox.ButtonSymbols.NoButtons)
+        self.Seq2PDFVolumeSize.setMaximum(1048576)
+
+        self.Seq2PDOptions.addWidget(self.Seq2PDFVolumeSize)
+
 
         self.verticalLayout_18.addLayout(self.Seq2PDOptions)
 
@@ -232,6 +320,11 @@ class Ui_Form(object):
 
         self.Seq2PDFBtns.addWidget(self.Seq2PDFRun)
 
+        self.Seq2PDFPlan = QPushButton(self.Seq2PDF)
+        self.Seq2PDFPlan.setObjectName(u"Seq2PDFPlan")
+
+        self.Seq2PDFBtns.addWidget(self.Seq2PDFPlan)
+
         self.Seq2PDFStop = QPushButton(self.Seq2PDF)
         self.Seq2PDFStop.setObjectName(u"Seq2PDFStop")
         self.Seq2PDFStop.setEnabled(False)
@@ -519,10 +612,41 @@ class Ui_Form(object):
         self.PNG2JPGDedup.setItemText(2, QCoreApplication.translate("Form", u"\u91cd\u590d\u7684\u6587\u4ef6\uff1a\u589e\u52a0\u5e8f\u53f7", None))
 
         self.PNG2JPGDedup.setPlaceholderText(QCoreApplication.translate("Form", u"\u91cd\u590d\u7684\u6587\u4ef6", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGContentDedup.setToolTip(QCoreApplication.translate("Form", u"\u5185\u5bb9\u76f8\u540c\u7684\u56fe\u50cf\u53ea\u8f6c\u6362\u4e00\u6b21\uff0c\u5176\u4f59\u7684\u901a\u8fc7\u94fe\u63a5\u6216\u590d\u5236\u5f97\u5230", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGContentDedup.setText(QCoreApplication.translate("Form", u"\u5185\u5bb9\u53bb\u91cd", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGEncoder.setToolTip(QCoreApplication.translate("Form", u"\u8f93\u51fa\u683c\u5f0f\uff0cWebP \u4f1a\u4fdd\u7559\u900f\u660e\u901a\u9053", None))
+#endif // QT_CONFIG(tooltip)
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGJournal.setToolTip(QCoreApplication.translate("Form", u"\u8bb0\u5f55\u4efb\u52a1\u8fdb\u5ea6\uff0c\u7ec8\u6b62\u540e\u53ef\u4ee5\u70b9\u51fb\u201c\u7ee7\u7eed\u201d\u4ece\u4e0a\u6b21\u7684\u4f4d\u7f6e\u7ee7\u7eed", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGJournal.setText(QCoreApplication.translate("Form", u"\u8bb0\u5f55\u4efb\u52a1", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGIncremental.setToolTip(QCoreApplication.translate("Form", u"\u8df3\u8fc7\u4e0a\u6b21\u8f6c\u6362\u540e\u6ca1\u6709\u53d8\u5316\u7684\u56fe\u50cf\uff0c\u8f6c\u6362\u6e05\u5355\u4fdd\u5b58\u5728\u6240\u9009\u6587\u4ef6\u5939\u4e2d", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGIncremental.setText(QCoreApplication.translate("Form", u"\u589e\u91cf\u8f6c\u6362", None))
         self.PNG2JPGQualityTxt.setText(QCoreApplication.translate("Form", u"\u8d28\u91cf", None))
         self.PNG2JPGQualityNum.setText(QCoreApplication.translate("Form", u"80", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGTargetSize.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u4ee5\u6ed1\u5757\u8bbe\u7f6e\u7684\u8d28\u91cf\u4e3a\u4e0a\u9650\uff0c\u81ea\u52a8\u9009\u62e9\u4e0d\u8d85\u8fc7\u76ee\u6807\u5927\u5c0f\u7684\u6700\u9ad8\u8d28\u91cf", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGTargetSize.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u9650\u5236\u5927\u5c0f", None))
+        self.PNG2JPGTargetSize.setSuffix(QCoreApplication.translate("Form", u" KB", None))
+        self.PNG2JPGTargetSize.setPrefix(QCoreApplication.translate("Form", u"\u76ee\u6807\u5927\u5c0f ", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGMaxSize.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u6309\u6bd4\u4f8b\u7f29\u5c0f\u957f\u8fb9\u8d85\u8fc7\u6b64\u503c\u7684\u56fe\u50cf", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGMaxSize.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u9650\u5236\u5c3a\u5bf8", None))
+        self.PNG2JPGMaxSize.setSuffix(QCoreApplication.translate("Form", u" px", None))
+        self.PNG2JPGMaxSize.setPrefix(QCoreApplication.translate("Form", u"\u6700\u5927\u8fb9\u957f ", None))
         self.PNG2JPGProgress.setFormat(QCoreApplication.translate("Form", u"%p %", None))
         self.PNG2JPGRun.setText(QCoreApplication.translate("Form", u"\u8fd0\u884c", None))
+#if QT_CONFIG(tooltip)
+        self.PNG2JPGResume.setToolTip(QCoreApplication.translate("Form", u"\u4ece\u4e0a\u6b21\u7ec8\u6b62\u7684\u4f4d\u7f6e\u7ee7\u7eed\uff0c\u8df3\u8fc7\u5df2\u5904\u7406\u7684\u6587\u4ef6\u548c\u6587\u4ef6\u5939", None))
+#endif // QT_CONFIG(tooltip)
+        self.PNG2JPGResume.setText(QCoreApplication.translate("Form", u"\u7ee7\u7eed", None))
         self.PNG2JPGStop.setText(QCoreApplication.translate("Form", u"\u7ec8\u6b62", None))
         self.ConvertorChildTab.setTabText(self.ConvertorChildTab.indexOf(self.PNG2JPG), QCoreApplication.translate("Form", u"PNG \u8f6c JPG", None))
 #if QT_CONFIG(tooltip)
@@ -532,7 +656,46 @@ class Ui_Form(object):
         self.Seq2PDFPathInput.setPlaceholderText(QCoreApplication.translate("Form", u"\u4ece\u6b64\u5904\u5f00\u59cb\u67e5\u627e\u56fe\u50cf", None))
         self.Seq2PDFDel.setText(QCoreApplication.translate("Form", u"\u5220\u9664\u539f\u6587\u4ef6", None))
         self.Seq2PDFRecursive.setText(QCoreApplication.translate("Form", u"\u9012\u5f52\u67e5\u627e", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFArchives.setToolTip(QCoreApplication.translate("Form", u"\u5c06 ZIP/CBZ \u538b\u7f29\u5305\u5f53\u4f5c\u6587\u4ef6\u5939\u67e5\u627e\u56fe\u50cf\u5e8f\u5217\uff0c\u538b\u7f29\u5305\u4e2d\u7684\u56fe\u50cf\u4e0d\u4f1a\u88ab\u89e3\u538b\u5230\u78c1\u76d8", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFArchives.setText(QCoreApplication.translate("Form", u"\u8bfb\u53d6\u538b\u7f29\u5305", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFFormat.setToolTip(QCoreApplication.translate("Form", u"\u8f93\u51fa\u683c\u5f0f\uff0cCBZ \u76f4\u63a5\u6253\u5305\u539f\u59cb\u56fe\u50cf\uff0c\u901f\u5ea6\u6700\u5feb\uff0c\u9875\u9762\u5c3a\u5bf8\u3001\u8ffd\u52a0\u548c\u5206\u5377\u8bbe\u7f6e\u53ea\u5bf9 PDF \u6709\u6548", None))
+#endif // QT_CONFIG(tooltip)
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFAppend.setToolTip(QCoreApplication.translate("Form", u"\u5df2\u6709\u7531\u540c\u4e00\u5e8f\u5217\u751f\u6210\u7684 PDF \u65f6\uff0c\u53ea\u5c06\u65b0\u589e\u7684\u56fe\u50cf\u8ffd\u52a0\u5230\u5176\u672b\u5c3e\uff1b\u5df2\u5206\u5377\u7684 PDF \u4f1a\u8ffd\u52a0\u5230\u6700\u540e\u4e00\u5377\uff0c\u4e0d\u518d\u6309\u5206\u5377\u8bbe\u7f6e\u62c6\u5206", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFAppend.setText(QCoreApplication.translate("Form", u"\u8ffd\u52a0\u65b0\u9875\u9762", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFMaxDPI.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u7f29\u5c0f\u5206\u8fa8\u7387\u8d85\u8fc7\u6b64\u503c\u7684\u56fe\u50cf\uff0c\u9875\u9762\u5c3a\u5bf8\u4e0d\u53d8", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFMaxDPI.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u9650\u5236\u5206\u8fa8\u7387", None))
+        self.Seq2PDFMaxDPI.setSuffix(QCoreApplication.translate("Form", u" dpi", None))
+        self.Seq2PDFMaxDPI.setPrefix(QCoreApplication.translate("Form", u"\u6700\u5927\u5206\u8fa8\u7387 ", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFMaxSize.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u6309\u6bd4\u4f8b\u7f29\u5c0f\u957f\u8fb9\u8d85\u8fc7\u6b64\u503c\u7684\u56fe\u50cf", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFMaxSize.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u9650\u5236\u5c3a\u5bf8", None))
+        self.Seq2PDFMaxSize.setSuffix(QCoreApplication.translate("Form", u" px", None))
+        self.Seq2PDFMaxSize.setPrefix(QCoreApplication.translate("Form", u"\u6700\u5927\u8fb9\u957f ", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFVolumePages.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u6309\u9875\u6570\u5c06\u5e8f\u5217\u5206\u4e3a\u591a\u5377\uff0c\u6bcf\u5377\u5355\u72ec\u4fdd\u5b58", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFVolumePages.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u5206\u5377", None))
+        self.Seq2PDFVolumePages.setSuffix(QCoreApplication.translate("Form", u" \u9875", None))
+        self.Seq2PDFVolumePages.setPrefix(QCoreApplication.translate("Form", u"\u6bcf\u5377\u6700\u591a ", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFVolumeSize.setToolTip(QCoreApplication.translate("Form", u"\u5927\u4e8e 0 \u65f6\uff0c\u6309\u56fe\u50cf\u6570\u636e\u7684\u5927\u5c0f\u5c06\u5e8f\u5217\u5206\u4e3a\u591a\u5377\uff0c\u6bcf\u5377\u5355\u72ec\u4fdd\u5b58", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFVolumeSize.setSpecialValueText(QCoreApplication.translate("Form", u"\u4e0d\u9650\u5236\u5377\u5927\u5c0f", None))
+        self.Seq2PDFVolumeSize.setSuffix(QCoreApplication.translate("Form", u" MB", None))
+        self.Seq2PDFVolumeSize.setPrefix(QCoreApplication.translate("Form", u"\u6bcf\u5377\u6700\u5927 ", None))
         self.Seq2PDFRun.setText(QCoreApplication.translate("Form", u"\u8fd0\u884c", None))
+#if QT_CONFIG(tooltip)
+        self.Seq2PDFPlan.setToolTip(QCoreApplication.translate("Form", u"\u53ea\u8bfb\u53d6\u56fe\u50cf\u5934\u90e8\u548c\u5c11\u91cf\u6837\u672c\uff0c\u9884\u4f30\u5e8f\u5217\u6570\u91cf\u3001\u9875\u6570\u3001\u8f93\u51fa\u5927\u5c0f\u548c\u8017\u65f6\uff0c\u4e0d\u5199\u5165\u4efb\u4f55\u6587\u4ef6\u3002\u4e4b\u540e\u4ee5\u76f8\u540c\u8bbe\u7f6e\u8fd0\u884c\u65f6\u4e0d\u518d\u91cd\u65b0\u67e5\u627e", None))
+#endif // QT_CONFIG(tooltip)
+        self.Seq2PDFPlan.setText(QCoreApplication.translate("Form", u"\u9884\u4f30", None))
         self.Seq2PDFStop.setText(QCoreApplication.translate("Form", u"\u7ec8\u6b62", None))
         self.ConvertorChildTab.setTabText(self.ConvertorChildTab.indexOf(self.Seq2PDF), QCoreApplication.translate("Form", u"\u56fe\u50cf\u5e8f\u5217\u8f6c PDF", None))
 #if QT_CONFIG(tooltip)